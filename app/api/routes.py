@@ -1,5 +1,6 @@
 from flask import request, jsonify, render_template
-from ..functions.search import rag_pipeline
+from ..functions.search import rag_pipeline, normalize_filters
+from ..functions.llm_gateway import LLMOverloadedError
 import logging
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -17,19 +18,27 @@ def setup_routes(app):
 
     @app.route('/api/patients', methods=['GET'])
     def get_patients():
-        from app.functions.iris import get_patient_list
+        from app.functions.patients import list_patients
 
         try:
-            patients = get_patient_list()
-            return jsonify({
-                'patients': patients,
-                'count': len(patients)
-            })
+            # Cursor pagination over the patient registry, optionally filtered by ID prefix
+            try:
+                page = list_patients(
+                    cursor=request.args.get('cursor') or None,
+                    prefix=request.args.get('prefix') or None,
+                    limit=int(request.args.get('limit', 100))
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            response = jsonify({k: v for k, v in page.items() if k != 'etag'})
+            response.set_etag(page['etag'])
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
         except Exception as e:
             logger.exception("Error retrieving patient list")
             return jsonify({'error': str(e)}), 500
 
-
     @app.route('/api/query', methods=['POST'])
     def api_query():
         try:
@@ -39,10 +48,18 @@ def setup_routes(app):
             if not query:
                 return jsonify({'error': 'Query is required'}), 400
 
+            # Optional filters, e.g. {"patient_id": "6", "resource_type": "Medication"}
+            try:
+                filters = normalize_filters(data.get('filters'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
             # Process query with RAG pipeline
-            response, sources = rag_pipeline(query)
+            usage = {}
+            response, sources = rag_pipeline(query, filters=filters, stats=usage)
 
             return jsonify({
+                'usage': usage,
                 'response': response,
                 'sources': [
                     {
@@ -54,10 +71,38 @@ def setup_routes(app):
                 ]
             })
 
+        except LLMOverloadedError as e:
+            logger.warning(f"Shedding query: {str(e)}")
+            return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
         except Exception as e:
             logger.exception("Error processing query")
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        from app.functions.index import get_index_status
+
+        status = get_index_status()
+        lines = [
+            "# HELP clinical_assistant_index_loaded Whether the in-memory note index is loaded",
+            "# TYPE clinical_assistant_index_loaded gauge",
+            f"clinical_assistant_index_loaded {int(status['loaded'])}"
+        ]
+        if status["loaded"]:
+            for name, kind, description in (
+                ("version", "gauge", "Version of the note index serving queries"),
+                ("notes", "gauge", "Notes in the current index"),
+                ("patients", "gauge", "Patients in the current index"),
+                ("built_at", "gauge", "Unix time at which the current index was built"),
+                ("staleness_seconds", "gauge", "Seconds since the index was last confirmed up to date"),
+                ("checks", "counter", "Background checks for index changes"),
+                ("refresh_errors", "counter", "Failed background index refreshes")
+            ):
+                metric = f"clinical_assistant_index_{name}" + ("_total" if kind == "counter" else "")
+                lines += [f"# HELP {metric} {description}", f"# TYPE {metric} {kind}", f"{metric} {status[name]}"]
+
+        return "\n".join(lines) + "\n", 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
     @app.errorhandler(404)
     def page_not_found(e):
         return render_template('error.html', error=str(e)), 404
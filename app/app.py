@@ -21,11 +21,12 @@ def check_db_initialized():
     try:
         conn = get_iris_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM NoteEmbeddings")
-        count = cursor.fetchone()[0]
+        # Any row will do; COUNT(*) would scan the whole table
+        cursor.execute("SELECT TOP 1 ID FROM NoteEmbeddings")
+        row = cursor.fetchone()
         cursor.close()
         conn.close()
-        return count > 0
+        return row is not None
     except Exception:
         return False
 
@@ -54,6 +55,10 @@ def initialize_database(force=False):
         return True
     else:
         logger.info("Database already initialized, skipping setup")
+
+        # Tables created by an earlier version may lack newer columns and tables
+        from scripts.setup_database import upgrade_tables
+        upgrade_tables()
         return False
 
 
@@ -88,11 +93,11 @@ if __name__ == "__main__":
     # Setup Flask app
     app = setup_app()
 
-    # Check if running in CLI mode
-    if "--cli" in sys.argv:
-        from app.cli import cli_interface
+    # Check if running in CLI mode (interactive, or non-interactive with --batch)
+    if "--cli" in sys.argv or "--batch" in sys.argv:
+        from app.cli import main
 
-        cli_interface()
+        sys.exit(main(sys.argv[1:]))
     else:
         # Run in web mode
         port = int(os.environ.get("PORT", 5000))
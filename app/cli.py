@@ -1,5 +1,11 @@
 from app.functions.search import rag_pipeline
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import json
+import time
 import logging
+import argparse
 
 logger = logging.getLogger("clinical_assistant.cli")
 
@@ -31,5 +37,148 @@ def cli_interface():
             print("Please try again or type 'exit' to quit.")
 
 
+def load_batch(path):
+    """
+    Load batch queries from a JSONL file.
+    Each line is {"query": ..., "id": optional, "k": optional, "filters": optional}.
+    """
+    requests = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            request = json.loads(line)
+            if not isinstance(request, dict) or not request.get("query"):
+                raise ValueError(f"{path}:{line_number}: expected an object with a 'query' field")
+            request.setdefault("id", line_number)
+            requests.append(request)
+    return requests
+
+
+def run_batch_query(request, k=3):
+    """Run one batch request through the RAG pipeline and return its result record"""
+    stats = {}
+    started = time.perf_counter()
+    result = {"id": request["id"], "query": request["query"]}
+    try:
+        answer, top_notes = rag_pipeline(
+            request["query"], k=request.get("k", k), filters=request.get("filters"), stats=stats
+        )
+        result["answer"] = answer
+        result["sources"] = [
+            {
+                "patient_id": n.get("patient_id", "Unknown"),
+                "note_id": n["note_id"],
+                "score": round(n["score"], 3)
+            }
+            for n in top_notes
+        ]
+    except Exception as e:
+        logger.error(f"Error processing batch query {request['id']}: {str(e)}")
+        result["error"] = str(e)
+
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    result["timings"] = stats.pop("timings", {})
+    result["usage"] = stats
+    return result
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize_batch(results, elapsed):
+    """Throughput, latency percentiles and mean per-stage timings for a batch run"""
+    latencies = [r["latency_ms"] for r in results]
+    stages = {}
+    for r in results:
+        for stage, ms in r["timings"].items():
+            stages.setdefault(stage, []).append(ms)
+
+    summary = {
+        "queries": len(results),
+        "errors": sum(1 for r in results if "error" in r),
+        "wall_s": round(elapsed, 3),
+        "throughput_qps": round(len(results) / elapsed, 3) if elapsed else None,
+        "stage_mean_ms": {stage: round(sum(v) / len(v), 3) for stage, v in stages.items()}
+    }
+    if latencies:
+        summary.update({
+            "latency_p50_ms": _percentile(latencies, 50),
+            "latency_p95_ms": _percentile(latencies, 95),
+            "latency_p99_ms": _percentile(latencies, 99),
+            "latency_max_ms": max(latencies)
+        })
+    return summary
+
+
+def warm_up():
+    """Load the embedding model, tokenizer and note index once so that all workers share them"""
+    from app.config.config import load_config
+    from app.functions.context import get_token_counter
+    from app.functions.embedding import get_embedding_model
+    from app.functions.index import get_note_index
+
+    get_embedding_model()
+    get_token_counter()
+    if load_config()["search"]["cache_index"]:
+        get_note_index()
+
+
+def batch_interface(input_path, output_path="-", workers=4, k=3):
+    """Run a JSONL file of queries through the RAG pipeline and write JSONL results"""
+    requests = load_batch(input_path)
+    logger.info(f"Running {len(requests)} batch queries with {workers} workers")
+    warm_up()
+
+    out = sys.stdout if output_path == "-" else open(output_path, "w")
+    results = []
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Results are written in input order as soon as they are available
+            for result in executor.map(lambda r: run_batch_query(r, k=k), requests):
+                results.append(result)
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+
+    summary = summarize_batch(results, elapsed)
+    logger.info(
+        f"Batch finished: {summary['queries']} queries, {summary['errors']} errors, "
+        f"{summary['throughput_qps']} queries/s"
+    )
+    print(json.dumps(summary, indent=2), file=sys.stderr if out is sys.stdout else sys.stdout)
+    return summary
+
+
+def parse_args(argv=None):
+    """Parse CLI options, ignoring flags meant for app.py"""
+    parser = argparse.ArgumentParser(description="IRIS Clinical Assistant command-line interface")
+    parser.add_argument("--batch", metavar="QUERIES_JSONL", help="Run queries from a JSONL file non-interactively")
+    parser.add_argument("--output", default="-", help="Where to write JSONL results (default: stdout)")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("CLI_WORKERS", 4)),
+                        help="Number of queries processed concurrently in batch mode")
+    parser.add_argument("-k", type=int, default=3, help="Notes retrieved per query")
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+def main(argv=None):
+    """Run the batch mode if requested, otherwise the interactive interface"""
+    args = parse_args(argv)
+    if args.batch:
+        summary = batch_interface(args.batch, args.output, workers=args.workers, k=args.k)
+        return 1 if summary["errors"] else 0
+
+    cli_interface()
+    return 0
+
+
 if __name__ == "__main__":
-    cli_interface()
\ No newline at end of file
+    sys.exit(main())
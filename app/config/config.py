@@ -1,12 +1,25 @@
 import os
 from dotenv import load_dotenv
 import logging
+from functools import lru_cache
 
 logger = logging.getLogger("clinical_assistant.config")
 
 
+def parse_shard(value):
+    """Parse "index/count" into (index, count), or None if empty"""
+    if not value:
+        return None
+    index, _, count = value.partition("/")
+    index, count = int(index), int(count)
+    if not 0 <= index < count:
+        raise ValueError(f"Invalid shard {value}: expected index/count with 0 <= index < count")
+    return index, count
+
+
+@lru_cache(maxsize=1)
 def load_config():
-    """Load configuration from environment variables"""
+    """Load configuration from environment variables (once per process)"""
     # Load environment variables from .env file
     load_dotenv()
 
@@ -22,16 +35,51 @@ def load_config():
             "model": os.environ.get("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
         },
         "llm": {
+            "backend": os.environ.get("LLM_BACKEND", "hf_api"),
             "api_key": os.environ.get("HF_API_KEY", ""),
             "model": os.environ.get("LLM_MODEL", "meta-llama/Meta-Llama-3-8B-Instruct"),
             "max_length": int(os.environ.get("LLM_MAX_LENGTH", 256)),
+            "context_tokens": int(os.environ.get("LLM_CONTEXT_TOKENS", 1024)),
+            "chunk_tokens": int(os.environ.get("LLM_CHUNK_TOKENS", 128)),
+            "tokenizer": os.environ.get("LLM_TOKENIZER", ""),
             "temperature": float(os.environ.get("LLM_TEMPERATURE", 0.7)),
-            "top_p": float(os.environ.get("LLM_TOP_P", 0.9))
+            "top_p": float(os.environ.get("LLM_TOP_P", 0.9)),
+            "model_path": os.environ.get("LLM_MODEL_PATH", ""),
+            "context_size": int(os.environ.get("LLM_CONTEXT_SIZE", 4096)),
+            "threads": int(os.environ["LLM_THREADS"]) if os.environ.get("LLM_THREADS") else None,
+            "max_concurrency": int(os.environ.get("LLM_MAX_CONCURRENCY", 4)),
+            "timeout": float(os.environ.get("LLM_TIMEOUT", 30)),
+            "hedge_after": float(os.environ.get("LLM_HEDGE_AFTER", 0)),
+            "queue_timeout": float(os.environ.get("LLM_QUEUE_TIMEOUT", 5)),
+            # Latency assumed for admission control until a call completes (default: LLM_QUEUE_TIMEOUT)
+            "prior_latency": float(os.environ["LLM_PRIOR_LATENCY"]) if os.environ.get("LLM_PRIOR_LATENCY") else None
         },
         "fhir": {
             "base_url": os.environ.get("FHIR_BASE_URL", "http://localhost:52773/fhir/r4")
+        },
+        "patients": {
+            "cache_ttl": float(os.environ.get("PATIENTS_CACHE_TTL", 60))
+        },
+        "search": {
+            "cache_index": os.environ.get("SEARCH_CACHE_INDEX", "true").lower() in ("1", "true", "yes"),
+            "sql_fast_path": os.environ.get("SEARCH_SQL_FAST_PATH", "true").lower() in ("1", "true", "yes"),
+            "index_refresh_interval": float(os.environ.get("SEARCH_INDEX_REFRESH_INTERVAL", 30)),
+            "codec": os.environ.get("SEARCH_CODEC", "none"),
+            "pq_subspaces": int(os.environ.get("SEARCH_PQ_SUBSPACES", 48)),
+            "rescore": int(os.environ.get("SEARCH_RESCORE", 100)),
+            # Shard served by this process, "index/count" (e.g. "0/4"), see app/shard_server.py
+            "shard": parse_shard(os.environ.get("SEARCH_SHARD", "")),
+            # Coordinator: shard server URLs in shard order
+            "shard_urls": [u.strip() for u in os.environ.get("SEARCH_SHARD_URLS", "").split(",") if u.strip()],
+            "shard_timeout": float(os.environ.get("SEARCH_SHARD_TIMEOUT", 2))
         }
     }
 
+    # Fail at startup rather than at the first index build; the PQ dimension check needs the model
+    if config["search"]["codec"] not in ("none", "int8", "pq"):
+        raise ValueError(f"Invalid SEARCH_CODEC {config['search']['codec']}: expected none, int8 or pq")
+    if config["search"]["pq_subspaces"] < 1:
+        raise ValueError(f"Invalid SEARCH_PQ_SUBSPACES {config['search']['pq_subspaces']}: must be positive")
+
     logger.info("Configuration loaded")
     return config
\ No newline at end of file
@@ -0,0 +1,128 @@
+import re
+import logging
+import threading
+from functools import lru_cache
+from ..config.config import load_config
+from ..utils.text_processing import split_note_sections
+
+logger = logging.getLogger("clinical_assistant.context")
+config = load_config()
+
+# Weight of query-term overlap when ranking chunks within the retrieved notes
+KEYWORD_WEIGHT = 0.3
+
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_tokenizer_lock = threading.Lock()
+
+
+def _approximate_token_count(text):
+    """Rough token count (words and punctuation) used when no tokenizer can be loaded"""
+    return len(_APPROX_TOKEN_RE.findall(text))
+
+
+def get_token_counter():
+    """Return (name, count_tokens) for the tokenizer of the configured generation model"""
+    # Concurrent first calls must not load the tokenizer (or local model) twice
+    with _tokenizer_lock:
+        return _load_token_counter()
+
+
+@lru_cache(maxsize=1)
+def _load_token_counter():
+    llm = config["llm"]
+    if llm["backend"] != "hf_api":
+        from ..functions.llm import get_local_backend
+        return llm["backend"], get_local_backend().count_tokens
+
+    name = llm["tokenizer"] or llm["model"]
+    try:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(name, token=llm["api_key"] or None)
+        logger.info(f"Loaded tokenizer: {name}")
+        return name, lambda text: len(tokenizer(text, add_special_tokens=False).input_ids)
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer {name}, using approximate token counts: {str(e)}")
+        return "approximate", _approximate_token_count
+
+
+@lru_cache(maxsize=64)
+def count_tokens(text):
+    """Count tokens of fixed prompt parts with the model tokenizer"""
+    return get_token_counter()[1](text)
+
+
+def _split_section(section, max_tokens, count):
+    """Split a section into chunks of at most max_tokens, repeating its header line in each"""
+    header, _, body = section.partition("\n")
+    header_tokens = count(header + "\n")
+    chunks = []
+    lines = []
+    tokens = header_tokens
+    for line in body.split("\n"):
+        line_tokens = count(line + "\n")
+        if lines and tokens + line_tokens > max_tokens:
+            chunks.append("\n".join([header] + lines))
+            lines = []
+            tokens = header_tokens
+        lines.append(line)
+        tokens += line_tokens
+    if lines or not chunks:
+        chunks.append("\n".join([header] + lines))
+    return chunks
+
+
+@lru_cache(maxsize=4096)
+def note_chunks(note_id, text):
+    """
+    Split a note into per-section chunks and tokenize them once.
+    Returns a tuple of (resource_type, chunk_text, token_count).
+    """
+    count = get_token_counter()[1]
+    sections = split_note_sections(text) or {None: text}
+    chunks = []
+    for resource_type, section in sections.items():
+        for chunk in _split_section(section, config["llm"]["chunk_tokens"], count):
+            chunks.append((resource_type, chunk, count(chunk)))
+    return tuple(chunks)
+
+
+def build_context(query, notes, budget=None):
+    """
+    Pack the highest-scoring note chunks into a token budget.
+    Returns (context text, usage dict).
+    """
+    budget = budget or config["llm"]["context_tokens"]
+    query_terms = set(query.lower().split())
+
+    candidates = []
+    for rank, n in enumerate(notes):
+        patient_id = n.get("patient_id", "Unknown")
+        label_tokens = count_tokens(f"[Patient {patient_id}]\n") + count_tokens("\n\n")
+        for position, (resource_type, chunk, tokens) in enumerate(note_chunks(n["note_id"], n["text"])):
+            text = chunk.lower()
+            overlap = sum(1 for term in query_terms if term in text) / len(query_terms) if query_terms else 0
+            score = n.get("score", 0) + KEYWORD_WEIGHT * overlap
+            candidates.append((score, rank, position, patient_id, chunk, tokens + label_tokens))
+
+    # Greedily take the best chunks that still fit
+    selected = []
+    used = 0
+    for candidate in sorted(candidates, key=lambda c: (-c[0], c[1], c[2])):
+        if used + candidate[5] <= budget:
+            selected.append(candidate)
+            used += candidate[5]
+
+    # Present the chosen chunks in note order, then section order
+    selected.sort(key=lambda c: (c[1], c[2]))
+    context = "\n\n".join(f"[Patient {c[3]}]\n{c[4]}" for c in selected)
+
+    usage = {
+        "tokenizer": get_token_counter()[0],
+        "context_tokens": used,
+        "context_budget": budget,
+        "chunks_used": len(selected),
+        "chunks_total": len(candidates),
+        "notes_used": sorted({c[1] for c in selected})
+    }
+    return context, usage
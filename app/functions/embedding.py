@@ -1,4 +1,3 @@
-from sentence_transformers import SentenceTransformer
 import logging
 from functools import lru_cache
 from ..config.config import load_config
@@ -12,6 +11,9 @@ config = load_config()
 @lru_cache(maxsize=1)
 def get_embedding_model():
     """Load and cache the embedding model"""
+    # Imported here so that importing the app does not pull in torch
+    from sentence_transformers import SentenceTransformer
+
     model_name = config["embedding"]["model"]
     logger.info(f"Loading embedding model: {model_name}")
     return SentenceTransformer(model_name)
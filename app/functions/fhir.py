@@ -1,7 +1,9 @@
 import requests
 import logging
+import urllib3
 from datetime import datetime
 from ..config.config import load_config
+from ..utils.json_stream import iter_json_array
 
 logger = logging.getLogger("clinical_assistant.fhir")
 config = load_config()
@@ -10,52 +12,154 @@ config = load_config()
 FHIR_BASE = config["fhir"]["base_url"]
 
 
-def get_patients():
-    """Fetch all patients from FHIR server"""
-    try:
-        response = requests.get(f"{FHIR_BASE}/Patient")
+def _iter_bundle_resources(url):
+    """Yield the resources of a FHIR Bundle one at a time while the response is read"""
+    with requests.get(url, stream=True) as response:
         response.raise_for_status()
-        entries = response.json().get("entry", [])
-        return [entry["resource"] for entry in entries]
+        response.raw.decode_content = True
+        for entry in iter_json_array(response.raw, "entry"):
+            yield entry["resource"]
+
+
+def get_patient_ids():
+    """Fetch the IDs of all patients from FHIR server"""
+    try:
+        return [patient["id"] for patient in _iter_bundle_resources(f"{FHIR_BASE}/Patient")]
     except Exception as e:
         logger.error(f"Error fetching patients: {str(e)}")
         return []
 
 
 def get_patient_data(patient_id, resource_types=["Condition", "Medication", "Procedure"]):
-    """Fetch specified resource types for a patient"""
+    """Fetch specified resource types for a patient as condition/medication/procedure records"""
     data = {}
     for resource_type in resource_types:
+        # Fetch and parse errors skip the resource type; a resource that cannot
+        # be extracted fails the whole patient in process_patients
+        extract = RECORD_EXTRACTORS.get(resource_type)
+        if extract is None:
+            logger.warning(f"Skipping {resource_type}: no record type for it")
+            data[resource_type] = []
+            continue
         try:
             url = f"{FHIR_BASE}/{resource_type}?subject=Patient/{patient_id}"
-            response = requests.get(url)
-            response.raise_for_status()
-            entries = response.json().get("entry", [])
-            data[resource_type] = [entry["resource"] for entry in entries]
-        except Exception as e:
+            data[resource_type] = [extract(r) for r in _iter_bundle_resources(url)]
+        # urllib3 errors: the connection dropped while the streamed body was being read
+        except (requests.RequestException, urllib3.exceptions.HTTPError, ValueError, KeyError) as e:
             logger.error(f"Error fetching {resource_type} for patient {patient_id}: {str(e)}")
             data[resource_type] = []
     return data
 
 
+class FactRecord:
+    """Base of the compact records holding the fields that summaries and fact tables use"""
+
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()})"
+
+
+class ConditionRecord(FactRecord):
+    __slots__ = ("name", "status", "verification", "onset", "abatement")
+
+
+class MedicationRecord(FactRecord):
+    __slots__ = ("name", "status", "dose_value", "dose_unit", "route", "start", "end")
+
+
+class ProcedureRecord(FactRecord):
+    __slots__ = ("name", "status", "performed", "start", "end", "body_site")
+
+
+def _coding_code(element):
+    """Return the first coding code of a CodeableConcept, if any"""
+    coding = (element or {}).get("coding") or [{}]
+    return coding[0].get("code")
+
+
+def extract_condition(cond):
+    """Extract the structured fields of a Condition resource"""
+    return ConditionRecord(
+        name=cond.get("code", {}).get("text"),
+        status=_coding_code(cond.get("clinicalStatus")),
+        verification=_coding_code(cond.get("verificationStatus")),
+        onset=cond.get("onsetDateTime"),
+        abatement=cond.get("abatementDateTime")
+    )
+
+
+def extract_medication(med):
+    """Extract the structured fields of a medication resource"""
+    fact = MedicationRecord(
+        name=med.get("medicationCodeableConcept", {}).get("text"),
+        status=med.get("status"),
+        start=med.get("effectivePeriod", {}).get("start"),
+        end=med.get("effectivePeriod", {}).get("end")
+    )
+
+    # Extract dosage if available
+    if "dosageInstruction" in med and len(med["dosageInstruction"]) > 0:
+        dosage = med["dosageInstruction"][0]
+        dose_quantity = dosage.get("doseAndRate", [{}])[0].get("doseQuantity", {})
+        fact.dose_value = dose_quantity.get("value")
+        fact.dose_unit = dose_quantity.get("unit")
+        fact.route = dosage.get("route", {}).get("text")
+
+    return fact
+
+
+def extract_procedure(proc):
+    """Extract the structured fields of a Procedure resource"""
+    performed_period = proc.get("performedPeriod", {})
+    body_site = None
+    if "bodySite" in proc and len(proc["bodySite"]) > 0:
+        body_site = proc["bodySite"][0].get("text")
+
+    return ProcedureRecord(
+        name=proc.get("code", {}).get("text"),
+        status=proc.get("status"),
+        performed=proc.get("performedDateTime"),
+        start=performed_period.get("start"),
+        end=performed_period.get("end"),
+        body_site=body_site
+    )
+
+
+# FHIR resource type requested by process_patients -> record extractor
+RECORD_EXTRACTORS = {
+    "Condition": extract_condition,
+    "Medication": extract_medication,
+    "Procedure": extract_procedure
+}
+
+
 def summarize_conditions(patient_id, conditions):
-    """Generate a summary of patient conditions"""
+    """Generate a summary of patient conditions from condition records"""
     lines = []
-    for cond in conditions:
-        # Extract condition details
-        code = cond.get("code", {}).get("text", "Unnamed condition")
-        status = cond.get("clinicalStatus", {}).get("coding", [{}])[0].get("code", "unknown")
-        verification = cond.get("verificationStatus", {}).get("coding", [{}])[0].get("code", "unknown")
-        onset = cond.get("onsetDateTime", "unknown onset")
-        abatement = cond.get("abatementDateTime", None)
+    for fact in conditions:
+        onset = fact.onset or "unknown onset"
 
         # Format timeline
-        if abatement:
-            timeline = f"from {onset} to {abatement}"
+        if fact.abatement:
+            timeline = f"from {onset} to {fact.abatement}"
         else:
             timeline = f"since {onset}"
 
-        lines.append(f"- {code} ({status}, {verification}) {timeline}")
+        lines.append(
+            f"- {fact.name or 'Unnamed condition'} "
+            f"({fact.status or 'unknown'}, {fact.verification or 'unknown'}) {timeline}"
+        )
 
     if not lines:
         return None
@@ -64,40 +168,26 @@ def summarize_conditions(patient_id, conditions):
 
 
 def summarize_medications(patient_id, medications):
-    """Generate a summary of patient medications"""
+    """Generate a summary of patient medications from medication records"""
     lines = []
-    for med in medications:
-        # Extract medication details
-        med_name = med.get("medicationCodeableConcept", {}).get("text", "Unnamed medication")
-        status = med.get("status", "unknown")
-
-        # Extract timing information
-        period_start = med.get("effectivePeriod", {}).get("start", "unknown start")
-        period_end = med.get("effectivePeriod", {}).get("end", None)
-
-        # Extract dosage if available
+    for fact in medications:
+        # Format dosage if available
         dosage_info = ""
-        if "dosageInstruction" in med and len(med["dosageInstruction"]) > 0:
-            dosage = med["dosageInstruction"][0]
-            dose_quantity = dosage.get("doseAndRate", [{}])[0].get("doseQuantity", {})
-            dose_value = dose_quantity.get("value", "")
-            dose_unit = dose_quantity.get("unit", "")
-
-            if dose_value and dose_unit:
-                dosage_info = f", {dose_value} {dose_unit}"
-
-            # Add route if available
-            route = dosage.get("route", {}).get("text", "")
-            if route:
-                dosage_info += f" {route}"
+        if fact.dose_value and fact.dose_unit:
+            dosage_info = f", {fact.dose_value} {fact.dose_unit}"
+        if fact.route:
+            dosage_info += f" {fact.route}"
 
         # Format timeline
-        if period_end:
-            timeline = f"from {period_start} to {period_end}"
+        period_start = fact.start or "unknown start"
+        if fact.end:
+            timeline = f"from {period_start} to {fact.end}"
         else:
             timeline = f"since {period_start}"
 
-        lines.append(f"- {med_name} ({status}{dosage_info}) {timeline}")
+        lines.append(
+            f"- {fact.name or 'Unnamed medication'} ({fact.status or 'unknown'}{dosage_info}) {timeline}"
+        )
 
     if not lines:
         return None
@@ -106,37 +196,24 @@ def summarize_medications(patient_id, medications):
 
 
 def summarize_procedures(patient_id, procedures):
-    """Generate a summary of patient procedures"""
+    """Generate a summary of patient procedures from procedure records"""
     lines = []
-    for proc in procedures:
-        # Extract procedure details
-        proc_name = proc.get("code", {}).get("text", "Unnamed procedure")
-        status = proc.get("status", "unknown")
-
-        # Extract date information
-        performed_date = proc.get("performedDateTime", None)
-        performed_period = proc.get("performedPeriod", {})
-
-        if performed_date:
-            timeline = f"on {performed_date}"
-        elif performed_period:
-            start = performed_period.get("start", "unknown start")
-            end = performed_period.get("end", None)
-            if end:
-                timeline = f"from {start} to {end}"
+    for fact in procedures:
+        # Format date information
+        if fact.performed:
+            timeline = f"on {fact.performed}"
+        elif fact.start or fact.end:
+            start = fact.start or "unknown start"
+            if fact.end:
+                timeline = f"from {start} to {fact.end}"
             else:
                 timeline = f"since {start}"
         else:
             timeline = "at unknown time"
 
-        # Extract body site if available
-        body_site = ""
-        if "bodySite" in proc and len(proc["bodySite"]) > 0:
-            site = proc["bodySite"][0].get("text", "")
-            if site:
-                body_site = f" on {site}"
+        body_site = f" on {fact.body_site}" if fact.body_site else ""
 
-        lines.append(f"- {proc_name} ({status}){body_site} {timeline}")
+        lines.append(f"- {fact.name or 'Unnamed procedure'} ({fact.status or 'unknown'}){body_site} {timeline}")
 
     if not lines:
         return None
@@ -148,26 +225,29 @@ def process_patients(include_resource_types=["Condition", "Medication", "Procedu
     """Process all patients and generate comprehensive summaries"""
     summaries = []
     failed_patients = []
-    patients = get_patients()
+    patient_ids = get_patient_ids()
 
-    logger.info(f"Processing {len(patients)} patients")
+    logger.info(f"Processing {len(patient_ids)} patients")
 
     # Simple progress tracking
-    for i, patient in enumerate(patients):
+    for i, pid in enumerate(patient_ids):
         try:
-            pid = patient["id"]
-
             # Print progress periodically
-            if (i + 1) % 10 == 0 or i + 1 == len(patients):
-                logger.info(f"Progress: {i + 1}/{len(patients)} patients processed")
+            if (i + 1) % 10 == 0 or i + 1 == len(patient_ids):
+                logger.info(f"Progress: {i + 1}/{len(patient_ids)} patients processed")
 
-            # Get multiple resource types
+            # Get multiple resource types as records; they feed both the summaries and the fact tables
             data = get_patient_data(pid, resource_types=include_resource_types)
+            facts = {
+                "Condition": data.get("Condition", []),
+                "Medication": data.get("Medication", []),
+                "Procedure": data.get("Procedure", [])
+            }
 
             # Generate different summary types
-            condition_summary = summarize_conditions(pid, data.get("Condition", []))
-            medication_summary = summarize_medications(pid, data.get("Medication", []))
-            procedure_summary = summarize_procedures(pid, data.get("Procedure", []))
+            condition_summary = summarize_conditions(pid, facts["Condition"])
+            medication_summary = summarize_medications(pid, facts["Medication"])
+            procedure_summary = summarize_procedures(pid, facts["Procedure"])
 
             # Combine summaries into a comprehensive patient note
             combined_text = "\n\n".join(filter(None, [
@@ -181,7 +261,8 @@ def process_patients(include_resource_types=["Condition", "Medication", "Procedu
                     "patient_id": pid,
                     "note_text": combined_text,
                     "note_id": f"patient-summary-{pid}",
-                    "last_updated": datetime.now().isoformat()
+                    "last_updated": datetime.now().isoformat(),
+                    "facts": facts
                 })
         except Exception as e:
             logger.error(f"Error processing patient {pid}: {str(e)}")
@@ -0,0 +1,341 @@
+import json
+import time
+import logging
+import threading
+from ..config.config import load_config
+from ..functions.iris import (
+    fetch_notes, iter_note_batches, get_notes_fingerprint, get_embedding_dimensions, add_notes_listener,
+    load_codebook, store_codebook, get_codebook_id, get_patient_list
+)
+from ..functions.shards import shard_patient_ids
+
+logger = logging.getLogger("clinical_assistant.index")
+config = load_config()
+
+
+class NoteIndex:
+    """Immutable in-memory note index partitioned by patient"""
+
+    def __init__(self, notes, version=0, fingerprint=None):
+        self.notes = notes
+        self.version = version
+        self.fingerprint = fingerprint
+        # (codec name, dimensions, codebook ID) of compressed embeddings, or None
+        self.codebook = None
+        if notes and "vectors" in notes[0]:
+            encoded = notes[0]["vectors"]
+            self.codebook = (encoded.codec.name, encoded.codec.dimensions, encoded.codebook_id)
+        self.built_at = time.time()
+        self.partitions = {}
+        for note in notes:
+            self.partitions.setdefault(note["patient_id"], []).append(note)
+
+    def __len__(self):
+        return len(self.notes)
+
+    def select(self, patient_ids=None):
+        """Return all notes, or only the notes in the given patients' partitions"""
+        if patient_ids is None:
+            return self.notes
+
+        selected = []
+        for patient_id in patient_ids:
+            selected.extend(self.partitions.get(patient_id, []))
+        return selected
+
+
+class IndexRefresher(threading.Thread):
+    """
+    Background thread that polls NoteEmbeddings for changes, builds the next index
+    version off the request path and swaps it in. Queries keep the version they started with.
+    """
+
+    def __init__(self, interval):
+        super().__init__(name="note-index-refresher", daemon=True)
+        self.interval = interval
+        self.wakeup = threading.Event()
+        self.checks = 0
+        self.errors = 0
+
+    def notify(self):
+        """Check for changes now instead of waiting for the next poll"""
+        self.wakeup.set()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                refresh_note_index()
+                self.checks += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error refreshing note index: {str(e)}")
+
+
+# A stored codebook is retrained once the corpus has grown this many times beyond the one it was trained on,
+CODEBOOK_RETRAIN_GROWTH = 10
+# or if it was trained on fewer vectors than this (PQ needs at least one per centroid in every subspace)
+MIN_TRAINING_VECTORS = 256
+
+# Set once the configured codec turned out not to fit the stored embeddings
+_codec_error = None
+
+
+def _iter_vectors(patient_ids, with_notes):
+    """Yield (notes or None, normalized float32 embeddings) for each batch of stored notes"""
+    from ..utils.quantization import normalize
+
+    columns = "PatientID, NoteID, NoteText, Embedding" if with_notes else "Embedding"
+    for rows in iter_note_batches(columns, patient_ids):
+        vectors = normalize([json.loads(row[-1]) for row in rows])
+        notes = [{"patient_id": row[0], "note_id": row[1], "text": row[2]} for row in rows] if with_notes else None
+        yield notes, vectors
+
+
+def _create_codec():
+    """The configured codec for the stored embeddings, or None if there are none or it cannot encode them"""
+    from ..utils.quantization import create_codec
+
+    global _codec_error
+    search = config["search"]
+    dimensions = get_embedding_dimensions()
+    if dimensions is None:
+        return None
+    try:
+        return create_codec(search["codec"], dimensions, subspaces=search["pq_subspaces"])
+    except ValueError as e:
+        # Warn once rather than on every rebuild; search falls back to exact embeddings
+        if _codec_error is None:
+            _codec_error = str(e)
+            logger.warning(f"Cannot use SEARCH_CODEC={search['codec']}, keeping float embeddings: {e}")
+        return None
+
+
+def _train_codebook(codec, sample):
+    """Train codec on a TrainingSample and store the codebook with the sizes it was trained on"""
+    codec.train(sample.vectors())
+    params = codec.to_params()
+    params["trained_on"] = sample.filled
+    params["corpus_size"] = sample.seen
+    return store_codebook(codec.name, codec.dimensions, params)
+
+
+def codebook_needs_training(params, corpus_size):
+    """Whether a stored codebook no longer fits a corpus of corpus_size notes"""
+    # Codebooks stored before the training size was recorded are retrained once
+    trained_on = params.get("trained_on", 0)
+    if trained_on < MIN_TRAINING_VECTORS and corpus_size > trained_on:
+        return True
+    return corpus_size >= CODEBOOK_RETRAIN_GROWTH * max(params.get("corpus_size", trained_on), 1)
+
+
+def _encode_notes(codec, patient_ids, sample=None):
+    """Read notes and encode their embeddings a batch at a time, optionally sampling them too"""
+    import numpy as np
+
+    notes = []
+    codes = []
+    for batch, vectors in _iter_vectors(patient_ids, with_notes=True):
+        notes.extend(batch)
+        codes.append(codec.encode(vectors))
+        if sample is not None:
+            sample.add(vectors)
+    return notes, np.concatenate(codes) if codes else None
+
+
+def load_compressed_notes(patient_ids=None):
+    """
+    Read notes with their embeddings replaced by codes of the configured codec. Embeddings are
+    encoded a batch at a time, so the float embeddings of the whole corpus are never in memory.
+    Returns None if the codec cannot encode embeddings of the stored size.
+    """
+    from ..utils.quantization import EncodedVectors, TrainingSample
+
+    codec = _create_codec()
+    if codec is None:
+        return None
+
+    # All workers share one persisted codebook; the first one to need it trains it
+    codebook_id, params = load_codebook(codec.name, codec.dimensions)
+    sample = TrainingSample()
+    if params is None:
+        for _, vectors in _iter_vectors(patient_ids, with_notes=False):
+            sample.add(vectors)
+        if not sample.filled:
+            return []
+        codebook_id = _train_codebook(codec, sample)
+        notes, codes = _encode_notes(codec, patient_ids)
+    else:
+        codec.load_params(params)
+        notes, codes = _encode_notes(codec, patient_ids, sample)
+        # A codebook trained on a much smaller corpus has poor centroids, so retrain and encode again
+        if notes and codebook_needs_training(params, sample.seen):
+            logger.info(
+                f"Retraining the {codec.name} codebook: trained on {params.get('trained_on', 'an unknown number of')} "
+                f"vectors, corpus now has {sample.seen}"
+            )
+            codebook_id = _train_codebook(codec, sample)
+            notes, codes = _encode_notes(codec, patient_ids)
+    if not notes:
+        return []
+
+    encoded = EncodedVectors(codec, codes, codebook_id=codebook_id)
+    for row, n in enumerate(notes):
+        n["vectors"] = encoded
+        n["row"] = row
+    logger.info(f"Compressed {len(notes)} embeddings with {codec.name} to {encoded.codes.nbytes / 1e6:.1f} MB")
+    return notes
+
+
+def train_codebook(patient_ids=None):
+    """
+    Train a new codebook for the configured codec on a sample of all stored embeddings.
+    Indexes pick it up at their next refresh. Returns the codebook ID, or None if nothing was trained.
+    """
+    from ..utils.quantization import TrainingSample
+
+    if config["search"]["codec"] == "none":
+        logger.error("SEARCH_CODEC is none, there is no codebook to train")
+        return None
+    codec = _create_codec()
+    if codec is None:
+        logger.error("No embeddings to train a codebook on, or SEARCH_CODEC cannot encode them")
+        return None
+
+    sample = TrainingSample()
+    for _, vectors in _iter_vectors(patient_ids, with_notes=False):
+        sample.add(vectors)
+    if not sample.filled:
+        logger.error("No embeddings to train a codebook on")
+        return None
+    codebook_id = _train_codebook(codec, sample)
+    logger.info(f"Trained {codec.name} codebook {codebook_id} on {sample.filled} of {sample.seen} embeddings")
+    return codebook_id
+
+
+def _codebook_changed(index):
+    """Whether a newer codebook was stored since the index was encoded"""
+    if index.codebook is None:
+        return False
+    name, dimensions, codebook_id = index.codebook
+    return get_codebook_id(name, dimensions) != codebook_id
+
+
+# Seconds before the request path tries again after a failed index build
+BUILD_RETRY_INTERVAL = 30
+
+_index = None
+_index_lock = threading.Lock()
+_refresher = None
+# Time at which the current index was last known to match the database
+_fresh_as_of = None
+# Time of the last failed index build, cleared by the next successful one
+_failed_at = None
+
+
+def _build_index(version):
+    # Read the fingerprint first: writes racing with fetch_notes are picked up by the next check
+    fingerprint = get_notes_fingerprint()
+    started = time.time()
+
+    # A shard server only holds the notes of the patients it owns
+    patient_ids = None
+    shard = config["search"]["shard"]
+    if shard:
+        patients = get_patient_list()
+        if fingerprint[0] and not patients:
+            raise RuntimeError("No patients fetched although NoteEmbeddings is not empty")
+        patient_ids = shard_patient_ids(patients, *shard)
+
+    notes = None
+    if config["search"]["codec"] != "none":
+        notes = load_compressed_notes(patient_ids)
+    if notes is None:
+        notes = fetch_notes(patient_ids=patient_ids)
+    if fingerprint[0] and not notes and patient_ids != []:
+        # fetch_notes returns nothing on errors; never swap a failed load in for a good index
+        raise RuntimeError("No notes fetched although NoteEmbeddings is not empty")
+    index = NoteIndex(notes, version=version, fingerprint=fingerprint)
+    logger.info(
+        f"Built note index v{version} with {len(notes)} notes for {len(index.partitions)} patients "
+        f"in {time.time() - started:.2f}s"
+    )
+    return index, started
+
+
+def _build_failed_recently():
+    failed_at = _failed_at
+    return failed_at is not None and time.time() - failed_at < BUILD_RETRY_INTERVAL
+
+
+def refresh_note_index(force=False, retry_failed=True):
+    """
+    Rebuild the index if NoteEmbeddings changed, then atomically swap it in.
+    Unless retry_failed, a build that failed within BUILD_RETRY_INTERVAL is not tried again.
+    """
+    global _index, _fresh_as_of, _failed_at
+    with _index_lock:
+        current = _index
+        # Callers that queued behind a failed build do not each repeat it
+        if not retry_failed and _build_failed_recently():
+            return current
+
+        checked_at = time.time()
+        if (not force and current is not None and get_notes_fingerprint() == current.fingerprint
+                and not _codebook_changed(current)):
+            _fresh_as_of = checked_at
+            return current
+
+        try:
+            index, fresh_as_of = _build_index(current.version + 1 if current is not None else 1)
+        except Exception:
+            _failed_at = time.time()
+            raise
+        _index, _fresh_as_of, _failed_at = index, fresh_as_of, None
+        return index
+
+
+def _start_refresher():
+    global _refresher
+    interval = config["search"]["index_refresh_interval"]
+    with _index_lock:
+        if _refresher is None and interval > 0:
+            _refresher = IndexRefresher(interval)
+            add_notes_listener(_refresher.notify)
+            _refresher.start()
+            logger.info(f"Started note index refresher (every {interval}s)")
+
+
+def get_note_index():
+    """Return the current in-memory note index, loading it on first use"""
+    index = _index
+    # Once the refresher runs it owns rebuilds: requests never wait behind one, even with an empty index
+    if _refresher is not None:
+        return index if index is not None else NoteIndex([])
+    # An empty index usually means the database was not ready yet, so retry, but not on every request
+    if (index is None or not len(index)) and not _build_failed_recently():
+        try:
+            index = refresh_note_index(retry_failed=False)
+        except Exception as e:
+            logger.error(f"Error loading note index (retrying in {BUILD_RETRY_INTERVAL}s): {str(e)}")
+        # The refresher also retries a failed first build in the background
+        _start_refresher()
+    return index if index is not None else NoteIndex([])
+
+
+def get_index_status():
+    """Version, size and staleness of the current note index, for monitoring"""
+    index = _index
+    if index is None:
+        return {"loaded": False}
+    return {
+        "loaded": True,
+        "version": index.version,
+        "notes": len(index),
+        "patients": len(index.partitions),
+        "built_at": index.built_at,
+        "staleness_seconds": round(time.time() - _fresh_as_of, 3),
+        "checks": _refresher.checks if _refresher else 0,
+        "refresh_errors": _refresher.errors if _refresher else 0
+    }
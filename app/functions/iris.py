@@ -1,15 +1,135 @@
-import intersystems_iris.dbapi._DBAPI as iris
+import re
 import json
 import logging
+from datetime import datetime
 from ..config.config import load_config
 
 logger = logging.getLogger("clinical_assistant.iris")
 config = load_config()
 
+# Maximum number of patient IDs bound into a single IN (...) filter
+PATIENT_BATCH_SIZE = 500
+
+# Rows fetched at a time when streaming notes
+NOTE_BATCH_SIZE = 256
+
+# RowVersion is bumped by every store_embedded_notes call so that in-place updates are detectable
+NOTE_EMBEDDINGS_DDL = """
+        CREATE TABLE IF NOT EXISTS NoteEmbeddings (
+            ID SERIAL,
+            PatientID VARCHAR(64),
+            NoteID VARCHAR(64),
+            NoteText TEXT,
+            Embedding TEXT,
+            RowVersion INTEGER
+        )
+        """
+
+# Trained embedding codebooks (see app/utils/quantization.py), newest row wins
+EMBEDDING_CODEBOOKS_DDL = """
+        CREATE TABLE IF NOT EXISTS EmbeddingCodebooks (
+            ID SERIAL,
+            Codec VARCHAR(32),
+            Dimensions INTEGER,
+            Params TEXT
+        )
+        """
+
+# One row per patient with notes, maintained on ingest so patient listings never scan NoteEmbeddings
+PATIENT_REGISTRY_DDL = """
+        CREATE TABLE IF NOT EXISTS PatientRegistry (
+            PatientID VARCHAR(64) PRIMARY KEY,
+            NoteCount INTEGER,
+            LastUpdated VARCHAR(32)
+        )
+        """
+
+# Callbacks run after notes are written in this process
+_notes_listeners = []
+
+# Structured facts extracted during ingestion, one table per resource type:
+# (table name, CREATE TABLE statement, fact key -> column)
+FACT_TABLES = {
+    "Condition": ("PatientConditions", """
+        CREATE TABLE IF NOT EXISTS PatientConditions (
+            ID SERIAL,
+            PatientID VARCHAR(64),
+            Name VARCHAR(255),
+            NameLower VARCHAR(255),
+            Status VARCHAR(32),
+            Verification VARCHAR(32),
+            OnsetDate VARCHAR(32),
+            AbatementDate VARCHAR(32)
+        )
+        """, {
+        "status": "Status",
+        "verification": "Verification",
+        "onset": "OnsetDate",
+        "abatement": "AbatementDate"
+    }),
+    "Medication": ("PatientMedications", """
+        CREATE TABLE IF NOT EXISTS PatientMedications (
+            ID SERIAL,
+            PatientID VARCHAR(64),
+            Name VARCHAR(255),
+            NameLower VARCHAR(255),
+            Status VARCHAR(32),
+            DoseValue VARCHAR(32),
+            DoseUnit VARCHAR(32),
+            Route VARCHAR(64),
+            StartDate VARCHAR(32),
+            EndDate VARCHAR(32)
+        )
+        """, {
+        "status": "Status",
+        "dose_value": "DoseValue",
+        "dose_unit": "DoseUnit",
+        "route": "Route",
+        "start": "StartDate",
+        "end": "EndDate"
+    }),
+    "Procedure": ("PatientProcedures", """
+        CREATE TABLE IF NOT EXISTS PatientProcedures (
+            ID SERIAL,
+            PatientID VARCHAR(64),
+            Name VARCHAR(255),
+            NameLower VARCHAR(255),
+            Status VARCHAR(32),
+            BodySite VARCHAR(128),
+            PerformedDate VARCHAR(32),
+            StartDate VARCHAR(32),
+            EndDate VARCHAR(32)
+        )
+        """, {
+        "status": "Status",
+        "body_site": "BodySite",
+        "performed": "PerformedDate",
+        "start": "StartDate",
+        "end": "EndDate"
+    })
+}
+
+# Lowercase words of every fact name, so name lookups are an indexed equality match on Term
+# instead of a LIKE '%term%' scan of the fact tables
+FACT_TERMS_DDL = """
+        CREATE TABLE IF NOT EXISTS PatientFactTerms (
+            ID SERIAL,
+            ResourceType VARCHAR(32),
+            Term VARCHAR(255),
+            PatientID VARCHAR(64),
+            NameLower VARCHAR(255),
+            Status VARCHAR(32)
+        )
+        """
+
+_WORD_RE = re.compile(r"\w+")
+
 
 def get_iris_connection():
     """Get connection to IRIS database"""
     try:
+        import intersystems_iris.dbapi._DBAPI as iris
+
         conn = iris.connect(
             hostname=config["iris"]["hostname"],
             port=config["iris"]["port"],
@@ -23,22 +143,38 @@ def get_iris_connection():
         raise
 
 
-def fetch_notes():
-    """Retrieve all embedded notes from IRIS"""
+def _note_queries(columns, patient_ids=None):
+    """SELECT statements (with params) reading the given NoteEmbeddings columns, optionally of some patients"""
+    if patient_ids is None:
+        return [(f"SELECT {columns} FROM NoteEmbeddings", ())]
+
+    # Filter on PatientID so IRIS can use the PatientID index
+    patient_ids = list(patient_ids)
+    queries = []
+    for start in range(0, len(patient_ids), PATIENT_BATCH_SIZE):
+        batch = patient_ids[start:start + PATIENT_BATCH_SIZE]
+        placeholders = ", ".join("?" for _ in batch)
+        queries.append((f"SELECT {columns} FROM NoteEmbeddings WHERE PatientID IN ({placeholders})", tuple(batch)))
+    return queries
+
+
+def fetch_notes(patient_ids=None):
+    """Retrieve embedded notes from IRIS, optionally only those of the given patients"""
     try:
         conn = get_iris_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT PatientID, NoteID, NoteText, Embedding FROM NoteEmbeddings")
 
         results = []
-        for row in cursor.fetchall():
-            embedding = json.loads(row[3])
-            results.append({
-                "patient_id": row[0],
-                "note_id": row[1],
-                "text": row[2],
-                "embedding": embedding
-            })
+        for sql, params in _note_queries("PatientID, NoteID, NoteText, Embedding", patient_ids):
+            cursor.execute(sql, params)
+            for row in cursor.fetchall():
+                embedding = json.loads(row[3])
+                results.append({
+                    "patient_id": row[0],
+                    "note_id": row[1],
+                    "text": row[2],
+                    "embedding": embedding
+                })
 
         cursor.close()
         conn.close()
@@ -50,6 +186,150 @@ def fetch_notes():
         return []
 
 
+def iter_note_batches(columns, patient_ids=None, batch_size=NOTE_BATCH_SIZE):
+    """
+    Yield rows of the given NoteEmbeddings columns batch_size at a time, optionally only
+    those of the given patients, so that callers never hold every embedding at once.
+    Unlike fetch_notes, errors are raised.
+    """
+    conn = get_iris_connection()
+    cursor = conn.cursor()
+    try:
+        for sql, params in _note_queries(columns, patient_ids):
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def fetch_embeddings(note_ids):
+    """Retrieve the full-precision embeddings of the given notes as {note_id: embedding}"""
+    conn = get_iris_connection()
+    cursor = conn.cursor()
+    try:
+        note_ids = list(note_ids)
+        embeddings = {}
+        for start in range(0, len(note_ids), PATIENT_BATCH_SIZE):
+            batch = note_ids[start:start + PATIENT_BATCH_SIZE]
+            placeholders = ", ".join("?" for _ in batch)
+            # Served by the NoteID index
+            cursor.execute(
+                f"SELECT NoteID, Embedding FROM NoteEmbeddings WHERE NoteID IN ({placeholders})", tuple(batch)
+            )
+            for note_id, embedding in cursor.fetchall():
+                embeddings[note_id] = json.loads(embedding)
+        return embeddings
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_embedding_dimensions():
+    """Size of the stored embeddings, or None if there are no notes"""
+    conn = get_iris_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT TOP 1 Embedding FROM NoteEmbeddings")
+        row = cursor.fetchone()
+        return len(json.loads(row[0])) if row else None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def load_codebook(codec, dimensions):
+    """Return (ID, params) of the latest trained codebook for a codec, or (None, None)"""
+    conn = get_iris_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(EMBEDDING_CODEBOOKS_DDL)
+        cursor.execute(
+            "SELECT TOP 1 ID, Params FROM EmbeddingCodebooks WHERE Codec = ? AND Dimensions = ? ORDER BY ID DESC",
+            (codec, dimensions)
+        )
+        row = cursor.fetchone()
+        return (row[0], json.loads(row[1])) if row else (None, None)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_codebook_id(codec, dimensions):
+    """ID of the latest trained codebook for a codec, without reading its params"""
+    conn = get_iris_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(EMBEDDING_CODEBOOKS_DDL)
+        cursor.execute(
+            "SELECT MAX(ID) FROM EmbeddingCodebooks WHERE Codec = ? AND Dimensions = ?", (codec, dimensions)
+        )
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def store_codebook(codec, dimensions, params):
+    """Persist trained codebook params so that all workers encode with the same codebook; return its ID"""
+    conn = get_iris_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(EMBEDDING_CODEBOOKS_DDL)
+        cursor.execute(
+            "INSERT INTO EmbeddingCodebooks (Codec, Dimensions, Params) VALUES (?, ?, ?)",
+            (codec, dimensions, json.dumps(params))
+        )
+        conn.commit()
+        cursor.execute(
+            "SELECT MAX(ID) FROM EmbeddingCodebooks WHERE Codec = ? AND Dimensions = ?", (codec, dimensions)
+        )
+        codebook_id = cursor.fetchone()[0]
+        logger.info(f"Stored {codec} codebook for {dimensions}-dimensional embeddings")
+        return codebook_id
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def ensure_note_table(cursor):
+    """Create NoteEmbeddings if needed and add the RowVersion column to older tables"""
+    cursor.execute(NOTE_EMBEDDINGS_DDL)
+    try:
+        cursor.execute("SELECT RowVersion FROM NoteEmbeddings WHERE 1 = 0")
+        cursor.fetchall()
+    except Exception:
+        logger.info("Adding RowVersion column to NoteEmbeddings")
+        cursor.execute("ALTER TABLE NoteEmbeddings ADD RowVersion INTEGER")
+
+
+def add_notes_listener(callback):
+    """Register a callback to run after store_embedded_notes commits"""
+    _notes_listeners.append(callback)
+
+
+def get_notes_fingerprint():
+    """Return (row count, max ID, max row version) of NoteEmbeddings, which changes on every write"""
+    conn = get_iris_connection()
+    cursor = conn.cursor()
+    try:
+        try:
+            cursor.execute("SELECT COUNT(*), MAX(ID), MAX(RowVersion) FROM NoteEmbeddings")
+        except Exception:
+            # Tables created before RowVersion existed; ensure_note_table adds it on the next setup or write
+            cursor.close()
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*), MAX(ID), NULL FROM NoteEmbeddings")
+        return tuple(cursor.fetchone())
+    finally:
+        cursor.close()
+        conn.close()
+
+
 def store_embedded_notes(summaries, embeddings):
     """Store embedded notes in IRIS database"""
     try:
@@ -57,15 +337,10 @@ def store_embedded_notes(summaries, embeddings):
         cursor = conn.cursor()
 
         # Ensure table exists
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS NoteEmbeddings (
-            ID SERIAL,
-            PatientID VARCHAR(64),
-            NoteID VARCHAR(64),
-            NoteText TEXT,
-            Embedding TEXT
-        )
-        """)
+        ensure_note_table(cursor)
+
+        cursor.execute("SELECT MAX(RowVersion) FROM NoteEmbeddings")
+        row_version = (cursor.fetchone()[0] or 0) + 1
 
         # Get existing notes to handle updates
         cursor.execute("SELECT NoteID FROM NoteEmbeddings")
@@ -81,37 +356,135 @@ def store_embedded_notes(summaries, embeddings):
             if summary["note_id"] in existing_notes:
                 cursor.execute("""
                     UPDATE NoteEmbeddings 
-                    SET NoteText = ?, Embedding = ?
+                    SET NoteText = ?, Embedding = ?, RowVersion = ?
                     WHERE NoteID = ?
                 """, (
                     summary["note_text"],
                     embedding_json,
+                    row_version,
                     summary["note_id"]
                 ))
                 updated += 1
             else:
                 cursor.execute("""
                     INSERT INTO NoteEmbeddings 
-                    (PatientID, NoteID, NoteText, Embedding)
-                    VALUES (?, ?, ?, ?)
+                    (PatientID, NoteID, NoteText, Embedding, RowVersion)
+                    VALUES (?, ?, ?, ?, ?)
                 """, (
                     summary["patient_id"],
                     summary["note_id"],
                     summary["note_text"],
-                    embedding_json
+                    embedding_json,
+                    row_version
                 ))
                 inserted += 1
 
+        update_patient_registry(cursor, {summary["patient_id"] for summary in summaries})
         conn.commit()
         cursor.close()
         conn.close()
 
         logger.info(f"Database updated: {inserted} inserted, {updated} updated")
-        return inserted, updated
     except Exception as e:
         logger.error(f"Error storing notes: {str(e)}")
         raise
 
+    for callback in _notes_listeners:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error notifying notes listener: {str(e)}")
+    return inserted, updated
+
+
+def update_patient_registry(cursor, patient_ids):
+    """Refresh the note counts and timestamps of the given patients in PatientRegistry"""
+    cursor.execute(PATIENT_REGISTRY_DDL)
+    now = datetime.now().isoformat(timespec="seconds")
+    patient_ids = sorted(patient_ids)
+    for start in range(0, len(patient_ids), PATIENT_BATCH_SIZE):
+        batch = patient_ids[start:start + PATIENT_BATCH_SIZE]
+        placeholders = ", ".join("?" for _ in batch)
+        cursor.execute(
+            f"SELECT PatientID, COUNT(*) FROM NoteEmbeddings WHERE PatientID IN ({placeholders}) GROUP BY PatientID",
+            tuple(batch)
+        )
+        counts = dict(cursor.fetchall())
+        cursor.execute(f"SELECT PatientID FROM PatientRegistry WHERE PatientID IN ({placeholders})", tuple(batch))
+        existing = {row[0] for row in cursor.fetchall()}
+
+        updates = [(counts[p], now, p) for p in batch if p in counts and p in existing]
+        inserts = [(p, counts[p], now) for p in batch if p in counts and p not in existing]
+        if updates:
+            cursor.executemany("UPDATE PatientRegistry SET NoteCount = ?, LastUpdated = ? WHERE PatientID = ?", updates)
+        if inserts:
+            cursor.executemany("INSERT INTO PatientRegistry (PatientID, NoteCount, LastUpdated) VALUES (?, ?, ?)", inserts)
+
+
+def rebuild_patient_registry():
+    """Rebuild PatientRegistry from NoteEmbeddings (for databases ingested before it existed)"""
+    conn = get_iris_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(PATIENT_REGISTRY_DDL)
+        cursor.execute("SELECT TOP 1 PatientID FROM PatientRegistry")
+        if cursor.fetchone() is not None:
+            return False
+        try:
+            cursor.execute("SELECT TOP 1 ID FROM NoteEmbeddings")
+            has_notes = cursor.fetchone() is not None
+        except Exception as e:
+            # Fresh database: nothing ingested yet, the registry is filled as notes are stored
+            logger.info(f"Not rebuilding patient registry, NoteEmbeddings is not readable: {str(e)}")
+            return False
+        if not has_notes:
+            return False
+
+        cursor.execute("SELECT DISTINCT PatientID FROM NoteEmbeddings")
+        patient_ids = [row[0] for row in cursor.fetchall()]
+        update_patient_registry(cursor, patient_ids)
+        conn.commit()
+        logger.info(f"Rebuilt patient registry with {len(patient_ids)} patients")
+        return True
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def get_patient_page(after=None, prefix=None, limit=100):
+    """
+    Return up to limit registry rows (patient_id, note_count, last_updated) ordered by PatientID,
+    starting after the given PatientID and optionally restricted to IDs starting with prefix
+    """
+    conditions = []
+    params = []
+    if after is not None:
+        conditions.append("PatientID > ?")
+        params.append(after)
+    if prefix:
+        conditions.append("PatientID LIKE ? ESCAPE '\\'")
+        params.append(_escape_like(prefix) + "%")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = get_iris_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"SELECT TOP {int(limit)} PatientID, NoteCount, LastUpdated FROM PatientRegistry{where} ORDER BY PatientID",
+            tuple(params)
+        )
+        return [
+            {"patient_id": row[0], "note_count": row[1], "last_updated": row[2]}
+            for row in cursor.fetchall()
+        ]
+    finally:
+        cursor.close()
+        conn.close()
+
 
 def get_patient_list():
     """Retrieve list of available patients from IRIS database"""
@@ -119,11 +492,13 @@ def get_patient_list():
         conn = get_iris_connection()
         cursor = conn.cursor()
 
-        # Query for distinct patient IDs
-        cursor.execute("SELECT DISTINCT PatientID FROM NoteEmbeddings ORDER BY PatientID")
-
-        # Get the results
+        # Read the maintained registry; only fall back to scanning the notes if it is empty
+        cursor.execute(PATIENT_REGISTRY_DDL)
+        cursor.execute("SELECT PatientID FROM PatientRegistry ORDER BY PatientID")
         patients = [row[0] for row in cursor.fetchall()]
+        if not patients:
+            cursor.execute("SELECT DISTINCT PatientID FROM NoteEmbeddings ORDER BY PatientID")
+            patients = [row[0] for row in cursor.fetchall()]
 
         cursor.close()
         conn.close()
@@ -131,4 +506,160 @@ def get_patient_list():
         return patients
     except Exception as e:
         logger.error(f"Error fetching patient list: {str(e)}")
-        return []
\ No newline at end of file
+        return []
+
+
+def fact_terms(name):
+    """Distinct lowercase words of a fact name"""
+    return list(dict.fromkeys(_WORD_RE.findall(name.lower())))
+
+
+def _fact_term_rows(resource_type, patient_id, name, status):
+    name = name.lower()
+    return [(resource_type, term, patient_id, name, status) for term in fact_terms(name)]
+
+
+def rebuild_fact_terms():
+    """Fill PatientFactTerms from the fact tables (for facts ingested before it existed)"""
+    conn = get_iris_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(FACT_TERMS_DDL)
+        cursor.execute("SELECT TOP 1 ID FROM PatientFactTerms")
+        if cursor.fetchone() is not None:
+            return False
+
+        rows = []
+        for resource_type, (table, ddl, _) in FACT_TABLES.items():
+            cursor.execute(ddl)
+            cursor.execute(f"SELECT PatientID, NameLower, Status FROM {table}")
+            for patient_id, name, status in cursor.fetchall():
+                rows.extend(_fact_term_rows(resource_type, patient_id, name or "", status))
+        if not rows:
+            return False
+
+        cursor.executemany(
+            "INSERT INTO PatientFactTerms (ResourceType, Term, PatientID, NameLower, Status) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.commit()
+        logger.info(f"Rebuilt fact name index with {len(rows)} terms")
+        return True
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def store_patient_facts(summaries):
+    """Replace the structured condition/medication/procedure facts of the given patients"""
+    try:
+        conn = get_iris_connection()
+        cursor = conn.cursor()
+
+        # Ensure tables exist
+        for table, ddl, _ in FACT_TABLES.values():
+            cursor.execute(ddl)
+        cursor.execute(FACT_TERMS_DDL)
+
+        stored = 0
+        for summary in summaries:
+            facts = summary.get("facts")
+            if not facts:
+                continue
+
+            cursor.execute("DELETE FROM PatientFactTerms WHERE PatientID = ?", (summary["patient_id"],))
+            terms = []
+            for resource_type, (table, _, columns) in FACT_TABLES.items():
+                cursor.execute(f"DELETE FROM {table} WHERE PatientID = ?", (summary["patient_id"],))
+
+                rows = []
+                for fact in facts.get(resource_type, []):
+                    # Records from process_patients, or dicts when loaded from patient_summaries.json
+                    if not isinstance(fact, dict):
+                        fact = fact.to_dict()
+                    name = fact.get("name") or ""
+                    values = [None if fact.get(key) is None else str(fact[key]) for key in columns]
+                    rows.append((summary["patient_id"], name, name.lower(), *values))
+                    terms.extend(_fact_term_rows(resource_type, summary["patient_id"], name, values[0]))
+                    stored += 1
+
+                if rows:
+                    placeholders = ", ".join("?" for _ in rows[0])
+                    cursor.executemany(
+                        f"INSERT INTO {table} (PatientID, Name, NameLower, {', '.join(columns.values())}) "
+                        f"VALUES ({placeholders})",
+                        rows
+                    )
+
+            if terms:
+                cursor.executemany(
+                    "INSERT INTO PatientFactTerms (ResourceType, Term, PatientID, NameLower, Status) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    terms
+                )
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        logger.info(f"Stored {stored} structured facts")
+        return stored
+    except Exception as e:
+        logger.error(f"Error storing patient facts: {str(e)}")
+        raise
+
+
+def find_patients_by_fact(resource_type, term, status=None, patient_ids=None):
+    """
+    Return the sorted IDs of patients with a condition, medication or procedure
+    whose name contains term as a whole word, optionally only with the given status
+    (or one of a tuple of statuses), or None if no facts have been ingested
+    """
+    words = fact_terms(term)
+    if not words:
+        return None
+    try:
+        conn = get_iris_connection()
+        cursor = conn.cursor()
+
+        # Without any facts we cannot tell "no patients" from "not ingested"
+        cursor.execute("SELECT TOP 1 ID FROM PatientFactTerms WHERE ResourceType = ?", (resource_type,))
+        if cursor.fetchone() is None:
+            cursor.close()
+            conn.close()
+            return None
+
+        # Every word of a whole-word match is a whole word of the name, so look up the longest one
+        sql = "SELECT PatientID, NameLower FROM PatientFactTerms WHERE ResourceType = ? AND Term = ?"
+        params = [resource_type, max(words, key=len)]
+        if status:
+            statuses = [status] if isinstance(status, str) else list(status)
+            sql += f" AND Status IN ({', '.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        if patient_ids is not None:
+            patient_ids = list(patient_ids)
+            if not patient_ids or len(patient_ids) > PATIENT_BATCH_SIZE:
+                cursor.close()
+                conn.close()
+                return None
+            sql += f" AND PatientID IN ({', '.join('?' for _ in patient_ids)})"
+            params.extend(patient_ids)
+
+        cursor.execute(sql, tuple(params))
+
+        # A multi-word term was looked up by one word, so check the whole term against each name
+        word = re.compile(rf"\b{re.escape(term.lower())}\b")
+        matched = {row[0] for row in cursor.fetchall() if word.search(row[1] or "")}
+
+        # Numeric IDs in numeric order, then any others
+        patients = sorted(
+            matched,
+            key=lambda pid: (0, int(pid), "") if pid.isdigit() else (1, 0, pid)
+        )
+
+        cursor.close()
+        conn.close()
+        return patients
+    except Exception as e:
+        logger.error(f"Error querying {resource_type} facts: {str(e)}")
+        return None
\ No newline at end of file
@@ -1,89 +1,154 @@
-from huggingface_hub import InferenceClient
 import logging
 from functools import lru_cache
 from ..config.config import load_config
+from ..functions.context import build_context, count_tokens, get_token_counter
+from ..functions.llm_gateway import LLMGateway, LLMOverloadedError
+from ..functions.local_llm import create_local_backend
 from ..utils.text_processing import clean_llm_response
 
 logger = logging.getLogger("clinical_assistant.llm")
 config = load_config()
 
+# Instructions shared by every answer_query prompt, followed by the per-query part
+ANSWER_PROMPT_PREFIX = """
+You are a clinical assistant AI helping healthcare professionals.
+TASK: Answer the following question using ONLY the patient data provided below.
+
+FORMAT REQUIREMENTS:
+- Provide ONLY the answer with absolutely no postamble, or meta-commentary
+- Do not repeat the question
+- Do not include phrases like "Based on the information provided" or "According to the data"
+- Keep your answer to 1-2 sentences maximum
+- Do not include any disclaimers, notes, or caveats
+- Do not mention the PATIENT DATA section itself
+
+PATIENT DATA:
+"""
+
+ANSWER_PROMPT_TEMPLATE = """{context}
+
+QUESTION: {query}
+
+DIRECT ANSWER:
+"""
+
 
 @lru_cache(maxsize=1)
 def get_hf_client():
     """Get and cache Hugging Face client"""
+    # Imported here so that importing the app does not pull in huggingface_hub
+    from huggingface_hub import InferenceClient
+
     logger.info("Initializing Hugging Face client")
-    return InferenceClient(token=config["llm"]["api_key"])
+    return InferenceClient(token=config["llm"]["api_key"], timeout=config["llm"]["timeout"])
+
+
+@lru_cache(maxsize=1)
+def get_local_backend():
+    """Load and cache the local generation backend"""
+    return create_local_backend(config["llm"])
+
+
+def _hf_text_generation(prompt, model, max_length, temperature, top_p, prefix=None):
+    """Single text generation call to the Hugging Face API"""
+    client = get_hf_client()
+    logger.info(f"Generating text with model: {model}")
 
+    return client.text_generation(
+        prompt,
+        model=model,
+        max_new_tokens=max_length,
+        temperature=temperature,
+        top_p=top_p
+    )
 
-def generate_text(prompt, model=None, max_length=None, temperature=None, top_p=None):
-    """Generate text using Hugging Face API"""
+
+def _local_text_generation(prompt, model, max_length, temperature, top_p, prefix=None):
+    """Single text generation call to the local backend; the model comes from the backend config"""
+    logger.info(f"Generating text with local {config['llm']['backend']} backend")
+    return get_local_backend().generate(prompt, max_length, temperature, top_p, prefix=prefix)
+
+
+@lru_cache(maxsize=1)
+def get_llm_gateway():
+    """Get and cache the request gateway that all LLM calls go through"""
+    local = config["llm"]["backend"] != "hf_api"
+    return LLMGateway(
+        _local_text_generation if local else _hf_text_generation,
+        max_concurrency=config["llm"]["max_concurrency"],
+        timeout=config["llm"]["timeout"],
+        # A local model runs one generation at a time, so a hedge would only queue behind it
+        hedge_after=0 if local else config["llm"]["hedge_after"],
+        queue_timeout=config["llm"]["queue_timeout"],
+        prior_latency=config["llm"]["prior_latency"]
+    )
+
+
+def generate_text(prompt, model=None, max_length=None, temperature=None, top_p=None, prefix=None):
+    """
+    Generate text with the configured backend. prefix is a fixed leading part of
+    the prompt whose model state local backends may cache and reuse.
+    """
     model = model or config["llm"]["model"]
     max_length = max_length or config["llm"]["max_length"]
     temperature = temperature or config["llm"]["temperature"]
     top_p = top_p or config["llm"]["top_p"]
 
     try:
-        client = get_hf_client()
-        logger.info(f"Generating text with model: {model}")
-
-        response = client.text_generation(
+        return get_llm_gateway().generate(
             prompt,
             model=model,
-            max_new_tokens=max_length,
+            max_length=max_length,
             temperature=temperature,
-            top_p=top_p
+            top_p=top_p,
+            prefix=prefix
         )
-
-        return response
+    except LLMOverloadedError:
+        # Let callers turn this into a fast "service unavailable"
+        raise
     except Exception as e:
         logger.error(f"Error generating text: {str(e)}")
         return f"Error generating response: {str(e)}"
 
 
-def answer_query(query, context_notes, include_sources=True):
-    """Generate answer to a query using LLM with improved prompt"""
+def answer_query(query, context_notes, include_sources=True, stats=None, used_notes=None):
+    """
+    Generate answer to a query using LLM with improved prompt.
+    If a used_notes list is given, the notes that fit into the prompt are appended to it.
+    """
+    if used_notes is None:
+        used_notes = []
     try:
-        # Format context with patient IDs
-        context_items = []
-        for i, n in enumerate(context_notes):
-            patient_id = n.get("patient_id", "Unknown")
-            context_items.append(f"[Patient {patient_id}]\n{n['text']}")
-
-        context = "\n\n".join(context_items)
-
-        # Create prompt with stronger formatting instructions
-        prompt = f"""
-You are a clinical assistant AI helping healthcare professionals.
-TASK: Answer the following question using ONLY the patient data provided below.
-
-FORMAT REQUIREMENTS:
-- Provide ONLY the answer with absolutely no postamble, or meta-commentary
-- Do not repeat the question
-- Do not include phrases like "Based on the information provided" or "According to the data"
-- Keep your answer to 1-2 sentences maximum
-- Do not include any disclaimers, notes, or caveats
-- Do not mention the PATIENT DATA section itself
-
-PATIENT DATA:
-{context}
-
-QUESTION: {query}
-
-DIRECT ANSWER:
-"""
+        # Pack the most relevant note sections into the context token budget
+        context, usage = build_context(query, context_notes)
+        used_notes.extend(context_notes[i] for i in usage.pop("notes_used"))
+
+        # Fixed instructions first so that local backends can reuse their cached state
+        question = ANSWER_PROMPT_TEMPLATE.format(context=context, query=query)
+        prompt = ANSWER_PROMPT_PREFIX + question
+        usage["prompt_tokens"] = count_tokens(ANSWER_PROMPT_PREFIX) + get_token_counter()[1](question)
+        logger.info(
+            f"Prompt uses {usage['prompt_tokens']} tokens "
+            f"({usage['context_tokens']}/{usage['context_budget']} context, "
+            f"{usage['chunks_used']}/{usage['chunks_total']} chunks)"
+        )
+        if stats is not None:
+            stats.update(usage)
 
         # Generate and clean response
-        response = generate_text(prompt)
+        response = generate_text(prompt, prefix=ANSWER_PROMPT_PREFIX)
         clean_response = clean_llm_response(response)
 
         # Add sources if requested
         if include_sources:
-            sources = [f"Patient {n.get('patient_id', 'Unknown')}" for n in context_notes]
+            sources = [f"Patient {n.get('patient_id', 'Unknown')}" for n in used_notes]
             source_text = f"\n\nSources: {', '.join(sources)}"
             return clean_response + source_text
 
         return clean_response
 
+    except LLMOverloadedError:
+        raise
     except Exception as e:
         logger.error(f"Error answering query: {str(e)}")
         return "I encountered an error while generating a response. Please try again."
\ No newline at end of file
@@ -0,0 +1,154 @@
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger("clinical_assistant.llm_gateway")
+
+
+class LLMOverloadedError(Exception):
+    """Raised when an LLM request is shed because it could not start within the queue deadline"""
+
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM request does not complete within its deadline"""
+
+
+class LLMGateway:
+    """
+    Request management around an LLM call: coalesces identical in-flight prompts,
+    caps concurrent upstream calls, enforces a per-request deadline with an optional
+    hedged retry, and sheds load when the queue deadline would be exceeded
+    """
+
+    def __init__(self, call, max_concurrency=4, timeout=30.0, hedge_after=0.0, queue_timeout=5.0,
+                 prior_latency=None):
+        self._call = call
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.queue_timeout = queue_timeout
+        # Latency assumed until a call has completed
+        self.prior_latency = queue_timeout if prior_latency is None else prior_latency
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._waiting = 0
+        self._active = 0
+        self._latency = None
+
+        self.stats = {
+            "requests": 0,
+            "coalesced": 0,
+            "upstream_calls": 0,
+            "hedged": 0,
+            "shed": 0,
+            "timeouts": 0,
+            "errors": 0
+        }
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _expected_wait(self):
+        """Estimate how long a new request would queue for a slot"""
+        # Waiting requests that free slots will take right away do not hold up a new one
+        ahead = max(0, self._waiting - (self.max_concurrency - self._active))
+        latency = self.prior_latency if self._latency is None else self._latency
+        return ahead / self.max_concurrency * latency
+
+    def _submit(self, prompt, params):
+        """Start one upstream attempt on an already acquired slot"""
+        started = time.monotonic()
+        with self._lock:
+            self._active += 1
+
+        def attempt():
+            try:
+                return self._call(prompt, **params)
+            finally:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    # Exponentially weighted latency, used to predict queueing delay
+                    self._latency = elapsed if self._latency is None else 0.8 * self._latency + 0.2 * elapsed
+                    self._active -= 1
+                self._slots.release()
+
+        self._count("upstream_calls")
+        return self._executor.submit(attempt)
+
+    def _acquire_slot(self):
+        with self._lock:
+            if self._expected_wait() > self.queue_timeout:
+                self.stats["shed"] += 1
+                raise LLMOverloadedError("LLM queue is full, please retry later")
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            self._count("shed")
+            raise LLMOverloadedError("Timed out waiting for an LLM slot, please retry later")
+
+    def _run(self, prompt, params):
+        """Run a request with a deadline, hedging once if the first attempt is slow"""
+        self._acquire_slot()
+        deadline = time.monotonic() + self.timeout
+        pending = {self._submit(prompt, params)}
+
+        if self.hedge_after and self.hedge_after < self.timeout:
+            done, _ = wait(pending, timeout=self.hedge_after)
+            # Only hedge if there is spare capacity; never queue behind other requests for it
+            if not done and self._slots.acquire(blocking=False):
+                self._count("hedged")
+                pending.add(self._submit(prompt, params))
+
+        error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+
+        if error is not None and not pending:
+            raise error
+        self._count("timeouts")
+        raise LLMTimeoutError(f"LLM request exceeded its {self.timeout}s deadline")
+
+    def generate(self, prompt, **params):
+        """Generate text, sharing the result with identical requests already in flight"""
+        key = (prompt, tuple(sorted(params.items())))
+        with self._lock:
+            self.stats["requests"] += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            return future.result(timeout=self.queue_timeout + self.timeout)
+
+        try:
+            result = self._run(prompt, params)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            if not isinstance(e, (LLMOverloadedError, LLMTimeoutError)):
+                self._count("errors")
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
@@ -0,0 +1,155 @@
+import copy
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("clinical_assistant.local_llm")
+
+# Number of distinct prompt prefixes whose KV state is kept in memory
+MAX_CACHED_PREFIXES = 4
+
+
+class PrefixCache:
+    """Small LRU cache of model state for fixed prompt prefixes"""
+
+    def __init__(self, max_entries=MAX_CACHED_PREFIXES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, prefix, build):
+        entry = self._entries.get(prefix)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(prefix)
+            return entry
+
+        self.misses += 1
+        entry = build(prefix)
+        self._entries[prefix] = entry
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+
+class LlamaCppBackend:
+    """Local GGUF model served with llama.cpp, reusing the KV state of cached prompt prefixes"""
+
+    def __init__(self, model_path, n_ctx=4096, n_threads=None):
+        from llama_cpp import Llama
+
+        logger.info(f"Loading llama.cpp model: {model_path}")
+        self.llm = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads, verbose=False)
+        self.prefix_cache = PrefixCache()
+        # A llama.cpp context holds a single sequence, so generations run one at a time
+        self._lock = threading.Lock()
+
+    def _tokenize(self, text, add_bos, special=False):
+        # Only trusted prompt text may spell control tokens; notes and questions are tokenized as plain text
+        return self.llm.tokenize(text.encode("utf-8"), add_bos=add_bos, special=special)
+
+    def count_tokens(self, text):
+        return len(self._tokenize(text, add_bos=False))
+
+    def _build_prefix(self, prefix):
+        tokens = self._tokenize(prefix, add_bos=True, special=True)
+        self.llm.reset()
+        self.llm.eval(tokens)
+        return tokens, self.llm.save_state()
+
+    def generate(self, prompt, max_length, temperature, top_p, prefix=None):
+        with self._lock:
+            if prefix and prompt.startswith(prefix) and len(prompt) > len(prefix):
+                prefix_tokens, state = self.prefix_cache.get(prefix, self._build_prefix)
+                self.llm.load_state(state)
+                tokens = prefix_tokens + self._tokenize(prompt[len(prefix):], add_bos=False)
+            else:
+                tokens = self._tokenize(prompt, add_bos=True)
+
+            # generate() only evaluates the tokens past the longest prefix already in the context
+            output = []
+            for token in self.llm.generate(tokens, temp=temperature, top_p=top_p, reset=True):
+                if token == self.llm.token_eos() or len(output) >= max_length:
+                    break
+                output.append(token)
+
+            return self.llm.detokenize(output).decode("utf-8", errors="ignore")
+
+
+class TransformersBackend:
+    """Local Hugging Face causal LM on CPU, reusing the past key/values of cached prompt prefixes"""
+
+    def __init__(self, model_name_or_path, n_threads=None):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        if n_threads:
+            torch.set_num_threads(n_threads)
+
+        logger.info(f"Loading transformers model: {model_name_or_path}")
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name_or_path)
+        self.model = AutoModelForCausalLM.from_pretrained(model_name_or_path)
+        self.model.eval()
+        self.prefix_cache = PrefixCache()
+        self._lock = threading.Lock()
+
+    def count_tokens(self, text):
+        return len(self.tokenizer(text, add_special_tokens=False).input_ids)
+
+    def _build_prefix(self, prefix):
+        input_ids = self.tokenizer(prefix, return_tensors="pt").input_ids
+        with self.torch.no_grad():
+            past_key_values = self.model(input_ids, use_cache=True).past_key_values
+        return input_ids, past_key_values
+
+    def generate(self, prompt, max_length, temperature, top_p, prefix=None):
+        torch = self.torch
+        with self._lock:
+            past_key_values = None
+            suffix_ids = None
+            if prefix and prompt.startswith(prefix):
+                suffix_ids = self.tokenizer(
+                    prompt[len(prefix):], add_special_tokens=False, return_tensors="pt"
+                ).input_ids
+
+            if suffix_ids is not None and suffix_ids.shape[-1] > 0:
+                prefix_ids, cached = self.prefix_cache.get(prefix, self._build_prefix)
+                input_ids = torch.cat([prefix_ids, suffix_ids], dim=-1)
+                # generate() extends the cache in place, so each request works on its own copy
+                past_key_values = copy.deepcopy(cached)
+            else:
+                input_ids = self.tokenizer(prompt, return_tensors="pt").input_ids
+
+            with torch.no_grad():
+                output = self.model.generate(
+                    input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=past_key_values,
+                    max_new_tokens=max_length,
+                    do_sample=temperature > 0,
+                    temperature=temperature,
+                    top_p=top_p,
+                    pad_token_id=self.tokenizer.eos_token_id
+                )
+
+            return self.tokenizer.decode(output[0, input_ids.shape[-1]:], skip_special_tokens=True)
+
+
+LOCAL_BACKENDS = {
+    "llama_cpp": lambda llm: LlamaCppBackend(
+        llm["model_path"], n_ctx=llm["context_size"], n_threads=llm["threads"]
+    ),
+    "transformers": lambda llm: TransformersBackend(
+        llm["model_path"] or llm["model"], n_threads=llm["threads"]
+    )
+}
+
+
+def create_local_backend(llm_config):
+    """Create the local generation backend selected by config["llm"]["backend"]"""
+    backend = llm_config["backend"]
+    if backend not in LOCAL_BACKENDS:
+        raise ValueError(f"Unknown local LLM backend: {backend}")
+    return LOCAL_BACKENDS[backend](llm_config)
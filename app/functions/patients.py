@@ -0,0 +1,71 @@
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from ..config.config import load_config
+from ..functions.iris import get_patient_page, rebuild_patient_registry, add_notes_listener
+
+logger = logging.getLogger("clinical_assistant.patients")
+config = load_config()
+
+MAX_PAGE_SIZE = 1000
+
+# Pages kept in the in-process cache
+MAX_CACHED_PAGES = 256
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_registry_checked = False
+
+
+def invalidate_patient_cache():
+    """Drop all cached patient pages (called after notes are stored in this process)"""
+    with _cache_lock:
+        _cache.clear()
+
+
+add_notes_listener(invalidate_patient_cache)
+
+
+def _ensure_registry():
+    global _registry_checked
+    if not _registry_checked:
+        rebuild_patient_registry()
+        _registry_checked = True
+
+
+def list_patients(cursor=None, prefix=None, limit=100):
+    """
+    Return one page of the patient registry as {"patients", "count", "next_cursor", "etag"}.
+    Pages are cached in process until the next ingest or for config["patients"]["cache_ttl"] seconds.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    key = (cursor, prefix, limit)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and now - entry[0] < config["patients"]["cache_ttl"]:
+            _cache.move_to_end(key)
+            return entry[1]
+
+    _ensure_registry()
+    # Fetch one extra row to know whether there is a next page
+    rows = get_patient_page(after=cursor, prefix=prefix, limit=limit + 1)
+    patients = rows[:limit]
+    page = {
+        "patients": patients,
+        "count": len(patients),
+        "next_cursor": patients[-1]["patient_id"] if len(rows) > limit else None
+    }
+    # Content hash, so every worker produces the same ETag for the same page
+    page["etag"] = hashlib.sha1(json.dumps(page, sort_keys=True).encode("utf-8")).hexdigest()
+
+    with _cache_lock:
+        _cache[key] = (now, page)
+        if len(_cache) > MAX_CACHED_PAGES:
+            _cache.popitem(last=False)
+    return page
@@ -0,0 +1,131 @@
+import re
+import logging
+from ..functions.iris import find_patients_by_fact
+
+logger = logging.getLogger("clinical_assistant.router")
+
+# Maximum number of patients listed in a fast-path answer
+MAX_LISTED_PATIENTS = 100
+
+_QUESTION = r"^\s*(?P<kind>which|what|list(?: all)?|show(?: all)?|how many)\s+patients\s+"
+_TERM = r"\s+(?P<active>active\s+)?(?:an?\s+|the\s+)?(?P<term>[\w][\w\s\-/']*?)\s*[?.!]*\s*$"
+
+# Clinical statuses of conditions a patient currently has ("recurrence" and "relapse" are kinds of "active")
+CURRENT_CONDITION_STATUSES = ("active", "recurrence", "relapse")
+
+# (pattern, resource type, status filter, (singular verb, plural verb)).
+# Procedures come before conditions so that "have had" is not read as "have", and longer
+# verb phrases come before shorter ones so that "have been diagnosed with" is not read as "have".
+QUERY_ROUTES = [
+    (re.compile(_QUESTION + r"(?:(?:are|is)\s+)?(?:currently\s+)?(?:on|taking|receiving)" + _TERM, re.IGNORECASE),
+     "Medication", "active", ("is on", "are on")),
+    (re.compile(_QUESTION + r"(?:take|use)" + _TERM, re.IGNORECASE),
+     "Medication", "active", ("is on", "are on")),
+    (re.compile(_QUESTION + r"(?:were|have\s+been|have\s+ever\s+been)\s+(?:prescribed|on|given)" + _TERM,
+                re.IGNORECASE),
+     "Medication", None, ("has been prescribed", "have been prescribed")),
+    (re.compile(_QUESTION + r"(?:had|have\s+had|underwent|have\s+undergone|received|have\s+received)" + _TERM,
+                re.IGNORECASE),
+     "Procedure", None, ("has undergone", "have undergone")),
+    # Any diagnosis, past or present
+    (re.compile(_QUESTION + r"(?:(?:are|were|have\s+been|have\s+ever\s+been)\s+diagnosed\s+with)" + _TERM,
+                re.IGNORECASE),
+     "Condition", None, ("has been diagnosed with", "have been diagnosed with")),
+    # Present tense: only conditions that are not resolved or inactive
+    (re.compile(_QUESTION + r"(?:suffer\s+from|have|has)" + _TERM, re.IGNORECASE),
+     "Condition", CURRENT_CONDITION_STATUSES, ("has", "have")),
+]
+
+# Terms that make a question more than a single lookup
+_COMPOUND_WORDS = {"and", "or", "but", "with", "without", "not", "who", "that", "since", "after", "before"}
+
+
+def parse_query(query):
+    """
+    Recognize aggregate/lookup questions that the fact tables can answer exactly.
+    Returns a dict describing the lookup, or None if the question needs the RAG pipeline.
+    """
+    for pattern, resource_type, status, verbs in QUERY_ROUTES:
+        match = pattern.match(query)
+        if not match:
+            continue
+
+        # "active" is a status for conditions but may be part of a medication or procedure name
+        active = bool(match.group("active")) and resource_type == "Condition"
+        term = match.group("term") if active else (match.group("active") or "") + match.group("term")
+        term = term.strip().lower()
+
+        words = term.split()
+        if not words or len(words) > 6 or _COMPOUND_WORDS.intersection(words) or len(term) < 3:
+            return None
+
+        if active:
+            status = CURRENT_CONDITION_STATUSES
+            verbs = ("has active", "have active")
+
+        return {
+            "count_only": match.group("kind").lower() == "how many",
+            "resource_type": resource_type,
+            "status": status,
+            "term": term,
+            "verbs": verbs
+        }
+    return None
+
+
+def _format_patients(patients):
+    listed = [f"Patient {pid}" for pid in patients[:MAX_LISTED_PATIENTS]]
+    if len(patients) > MAX_LISTED_PATIENTS:
+        return ", ".join(listed) + f" and {len(patients) - MAX_LISTED_PATIENTS} more"
+    if len(listed) > 1:
+        return ", ".join(listed[:-1]) + f" and {listed[-1]}"
+    return listed[0]
+
+
+def route_query(query, filters=None):
+    """
+    Answer recognizable aggregate/lookup questions directly from the structured
+    fact tables. Returns (answer, sources) like rag_pipeline, or None to fall back.
+    """
+    lookup = parse_query(query)
+    if lookup is None:
+        return None
+
+    filters = filters or {}
+    resource_types = filters.get("resource_types")
+    if resource_types and lookup["resource_type"] not in resource_types:
+        return None
+
+    term = lookup["term"]
+    patients = find_patients_by_fact(
+        lookup["resource_type"], term, status=lookup["status"], patient_ids=filters.get("patient_ids")
+    )
+    # Retry plural forms ("migraines") in the singular
+    if not patients and term.endswith("s"):
+        term = term[:-1]
+        patients = find_patients_by_fact(
+            lookup["resource_type"], term, status=lookup["status"], patient_ids=filters.get("patient_ids")
+        )
+
+    # No match may just mean the question uses a different name, so let the LLM try
+    if not patients:
+        return None
+
+    count = len(patients)
+    verb = lookup["verbs"][0] if count == 1 else lookup["verbs"][1]
+    noun = "patient" if count == 1 else "patients"
+    if lookup["count_only"]:
+        answer = f"{count} {noun} {verb} {term}."
+    else:
+        answer = f"{count} {noun} {verb} {term}: {_format_patients(patients)}."
+    if lookup["resource_type"] == "Condition" and lookup["status"] is None:
+        answer += " This includes resolved and inactive diagnoses."
+    answer += f"\n\nSources: {_format_patients(patients)}"
+
+    sources = [
+        {"patient_id": pid, "note_id": f"patient-summary-{pid}", "text": "", "score": 1.0}
+        for pid in patients[:MAX_LISTED_PATIENTS]
+    ]
+
+    logger.info(f"Answered query from {lookup['resource_type']} facts: {count} patients")
+    return answer, sources
@@ -1,31 +1,130 @@
 from ..functions.embedding import generate_embedding
 from ..functions.iris import fetch_notes
+from ..functions.index import get_note_index
 from ..functions.llm import answer_query
+from ..functions.router import route_query
+from ..config.config import load_config
 from ..utils.similarity import cosine_similarity
+from ..utils.text_processing import split_note_sections, NOTE_SECTION_HEADERS
+import time
 import logging
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 warnings.filterwarnings("ignore", message=".*NumPy: _ARRAY_API not found.*")
 
 logger = logging.getLogger("clinical_assistant.search")
-
-
-def hybrid_search(query, notes, k=3, vector_weight=0.7):
+config = load_config()
+
+
+def _filter_values(filters, single, plural):
+    """Collect the values of a filter given either as a single value or as a list"""
+    values = []
+    if filters.get(single) is not None:
+        values.append(filters[single])
+    if filters.get(plural) is not None:
+        if not isinstance(filters[plural], list):
+            raise ValueError(f"{plural} must be a list")
+        values.extend(filters[plural])
+    return values
+
+
+def normalize_filters(filters):
+    """
+    Validate query filters and normalize them to
+    {"patient_ids": [...] or None, "resource_types": [...] or None}
+    """
+    filters = filters or {}
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object")
+
+    unknown = set(filters) - {"patient_id", "patient_ids", "resource_type", "resource_types"}
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+    patient_ids = None
+    values = _filter_values(filters, "patient_id", "patient_ids")
+    if values:
+        if any(isinstance(v, bool) or not isinstance(v, (str, int)) for v in values):
+            raise ValueError("patient IDs must be strings or integers")
+        # Keep the order but drop duplicates
+        patient_ids = list(dict.fromkeys(str(v) for v in values))
+
+    resource_types = None
+    values = _filter_values(filters, "resource_type", "resource_types")
+    if values:
+        known = {t.lower(): t for t in NOTE_SECTION_HEADERS}
+        if any(not isinstance(v, str) or v.lower() not in known for v in values):
+            raise ValueError(f"resource_type must be one of: {', '.join(NOTE_SECTION_HEADERS)}")
+        resource_types = list(dict.fromkeys(known[v.lower()] for v in values))
+
+    return {"patient_ids": patient_ids, "resource_types": resource_types}
+
+
+def select_notes(filters=None):
+    """Retrieve the candidate notes for a query, applying filters before any scoring"""
+    filters = normalize_filters(filters)
+    patient_ids = filters["patient_ids"]
+
+    # 1. Restrict to the requested patients' partitions (or PatientID index)
+    if config["search"]["cache_index"]:
+        notes = get_note_index().select(patient_ids)
+    else:
+        notes = fetch_notes(patient_ids=patient_ids)
+
+    # 2. Restrict note text to the requested sections
+    resource_types = filters["resource_types"]
+    if resource_types:
+        restricted = []
+        for n in notes:
+            sections = split_note_sections(n["text"])
+            kept = [sections[t] for t in resource_types if t in sections]
+            if kept:
+                restricted.append({**n, "text": "\n\n".join(kept)})
+        notes = restricted
+
+    return notes
+
+
+def _vector_scores(query_embedding, notes, k, keyword_scores, vector_weight):
+    """
+    Cosine similarity of the query with each note. Notes from a compressed index are
+    scanned by their codes, then the best candidates are re-scored with exact embeddings.
+    """
+    if not notes or "vectors" not in notes[0]:
+        return [cosine_similarity(query_embedding, n["embedding"]) for n in notes]
+
+    from ..functions.iris import fetch_embeddings
+    from ..utils.quantization import top_positions
+
+    approximate = notes[0]["vectors"].scores(query_embedding, [n["row"] for n in notes])
+    combined = [
+        vector_weight * approximate[i] + (1 - vector_weight) * keyword_scores[i]
+        for i in range(len(notes))
+    ]
+    shortlist = top_positions(combined, max(k, config["search"]["rescore"]))
+
+    scores = [float(score) for score in approximate]
+    try:
+        exact = fetch_embeddings(notes[i]["note_id"] for i in shortlist)
+    except Exception as e:
+        # The approximate ranking is still usable; do not turn a database error into "no relevant notes"
+        logger.warning(f"Re-scoring with exact embeddings failed, using approximate scores: {str(e)}")
+        return scores
+    for i in shortlist:
+        embedding = exact.get(notes[i]["note_id"])
+        if embedding is not None:
+            scores[i] = cosine_similarity(query_embedding, embedding)
+    # Notes outside the shortlist can no longer reach the top-k
+    shortlisted = set(shortlist.tolist())
+    return [score if i in shortlisted else float("-inf") for i, score in enumerate(scores)]
+
+
+def hybrid_search(query, notes, k=3, vector_weight=0.7, query_embedding=None):
     """Perform hybrid search combining vector similarity and keyword matching"""
     try:
-        # Get query embedding
-        query_embedding = generate_embedding(query)
-
-        # Vector similarity component
-        vector_scores = [
-            {
-                "patient_id": n.get("patient_id", "unknown"),
-                "note_id": n["note_id"],
-                "text": n["text"],
-                "score": cosine_similarity(query_embedding, n["embedding"])
-            }
-            for n in notes
-        ]
+        # Get query embedding (unless already computed, e.g. by a shard coordinator)
+        if query_embedding is None:
+            query_embedding = generate_embedding(query)
 
         # Keyword matching component
         query_terms = set(query.lower().split())
@@ -35,21 +134,17 @@ def hybrid_search(query, notes, k=3, vector_weight=0.7):
             text = n["text"].lower()
             # Calculate how many query terms appear in the text
             matches = sum(1 for term in query_terms if term in text)
-            score = matches / len(query_terms) if query_terms else 0
+            keyword_scores.append(matches / len(query_terms) if query_terms else 0)
 
-            keyword_scores.append({
-                "patient_id": n.get("patient_id", "unknown"),
-                "note_id": n["note_id"],
-                "text": n["text"],
-                "score": score
-            })
+        # Vector similarity component
+        vector_scores = _vector_scores(query_embedding, notes, k, keyword_scores, vector_weight)
 
         # Combine scores
         combined_scores = []
         for i in range(len(notes)):
             combined_score = (
-                    vector_weight * vector_scores[i]["score"] +
-                    (1 - vector_weight) * keyword_scores[i]["score"]
+                    vector_weight * vector_scores[i] +
+                    (1 - vector_weight) * keyword_scores[i]
             )
 
             combined_scores.append({
@@ -69,17 +164,48 @@ def hybrid_search(query, notes, k=3, vector_weight=0.7):
         return []
 
 
-def rag_pipeline(query, k=3):
-    """Complete RAG pipeline for clinical queries"""
+def rag_pipeline(query, k=3, filters=None, stats=None):
+    """
+    Complete RAG pipeline for clinical queries. Returns the answer and the notes it was based on.
+    If a stats dict is given, token usage and per-stage timings (ms) are recorded in it.
+    """
     logger.info(f"Processing query: '{query}'")
-
-    # 1. Retrieve notes from database
-    notes = fetch_notes()
-
-    # 2. Perform hybrid search for relevant context
-    top_notes = hybrid_search(query, notes, k=k)
-
-    # 3. Generate answer with context
-    answer = answer_query(query, top_notes)
-
-    return answer, top_notes
\ No newline at end of file
+    filters = normalize_filters(filters)
+    timings = {}
+    if stats is not None:
+        stats["timings"] = timings
+
+    def mark(stage, started):
+        timings[stage] = round((time.perf_counter() - started) * 1000, 3)
+        return time.perf_counter()
+
+    started = time.perf_counter()
+
+    # 0. Answer exact aggregate/lookup questions straight from the fact tables
+    if config["search"]["sql_fast_path"]:
+        routed = route_query(query, filters)
+        started = mark("route_query", started)
+        if routed is not None:
+            return routed
+
+    if config["search"]["shard_urls"]:
+        # 1-2. Fan out to the shard servers and merge their top-k notes
+        from ..functions.shards import sharded_search
+
+        top_notes = sharded_search(query, filters, k=k, stats=stats)
+        started = mark("sharded_search", started)
+    else:
+        # 1. Retrieve candidate notes, applying any patient/resource filters
+        notes = select_notes(filters)
+        started = mark("select_notes", started)
+
+        # 2. Perform hybrid search for relevant context
+        top_notes = hybrid_search(query, notes, k=k)
+        started = mark("hybrid_search", started)
+
+    # 3. Generate answer with context; only the notes that fit into the prompt are its sources
+    used_notes = []
+    answer = answer_query(query, top_notes, stats=stats, used_notes=used_notes)
+    mark("answer_query", started)
+
+    return answer, used_notes
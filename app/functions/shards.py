@@ -0,0 +1,95 @@
+import time
+import zlib
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from ..config.config import load_config
+from ..functions.embedding import generate_embedding
+
+logger = logging.getLogger("clinical_assistant.shards")
+config = load_config()
+
+_executor = None
+_executor_lock = threading.Lock()
+_sessions = threading.local()
+
+
+def shard_for(patient_id, shards):
+    """Stable shard number of a patient (the same in every process and on every node)"""
+    return zlib.crc32(str(patient_id).encode("utf-8")) % shards
+
+
+def shard_patient_ids(patient_ids, shard, shards):
+    """The subset of patient_ids owned by the given shard"""
+    return [p for p in patient_ids if shard_for(p, shards) == shard]
+
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard")
+        return _executor
+
+
+def _post(url, payload, timeout):
+    import requests
+
+    # One keep-alive session per fan-out thread
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+    response = session.post(f"{url.rstrip('/')}/search", json=payload, timeout=timeout)
+    response.raise_for_status()
+    return response.json()["results"]
+
+
+def sharded_search(query, filters, k=3, urls=None, timeout=None, stats=None):
+    """
+    Scatter a query to the shard servers owning the requested patients and merge their
+    top-k lists. Shards that fail or miss the deadline are left out of the result.
+    """
+    urls = urls or config["search"]["shard_urls"]
+    timeout = timeout or config["search"]["shard_timeout"]
+    shards = len(urls)
+
+    # Only fan out to the shards that own the filtered patients
+    targets = range(shards)
+    if filters["patient_ids"] is not None:
+        targets = sorted({shard_for(p, shards) for p in filters["patient_ids"]})
+
+    # Embed once here; shard servers only score
+    query_embedding = generate_embedding(query)
+    payload = {"query": query, "query_embedding": query_embedding, "k": k, "filters": filters, "shards": shards}
+
+    executor = _get_executor(max(4, shards * 4))
+    deadline = time.monotonic() + timeout
+    futures = {
+        executor.submit(_post, urls[shard], {**payload, "shard": shard}, timeout): shard
+        for shard in targets
+    }
+    done, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+
+    results = []
+    failed = []
+    for future in done:
+        if future.exception() is None:
+            results.extend(future.result())
+        else:
+            failed.append(futures[future])
+            logger.warning(f"Shard {futures[future]} failed: {str(future.exception())}")
+    late = sorted(futures[f] for f in pending)
+    if late:
+        logger.warning(f"Shards {late} missed the {timeout}s deadline, returning partial results")
+
+    if stats is not None:
+        stats["shards"] = {
+            "queried": len(futures),
+            "responded": len(done) - len(failed),
+            "failed": sorted(failed),
+            "late": late
+        }
+
+    # Scores are absolute (cosine + keyword overlap), so per-shard top-k lists merge exactly
+    return heapq.nlargest(k, results, key=lambda r: r["score"])
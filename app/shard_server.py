@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import logging
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("clinical_assistant.shard_server")
+
+
+class ShardRequestHandler(BaseHTTPRequestHandler):
+    """Serve hybrid search over the notes of one shard"""
+
+    shard = None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        from app.functions.index import get_index_status
+
+        if self.path != "/health":
+            return self._send_json(404, {"error": "Not found"})
+        self._send_json(200, {"shard": self.shard[0], "shards": self.shard[1], "index": get_index_status()})
+
+    def do_POST(self):
+        if self.path != "/search":
+            return self._send_json(404, {"error": "Not found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            # A coordinator with a different shard layout would silently miss patients
+            if (body.get("shard"), body.get("shards")) != self.shard:
+                return self._send_json(409, {"error": f"This server is shard {self.shard[0]}/{self.shard[1]}"})
+            self._send_json(200, {"results": self.search(body)})
+        except (BrokenPipeError, ConnectionResetError):
+            # The coordinator gave up on this shard after its deadline
+            logger.debug("Coordinator closed the connection before the shard answered")
+        except Exception as e:
+            logger.exception("Error serving shard search")
+            self._send_json(500, {"error": str(e)})
+
+    def search(self, body):
+        from app.config.config import load_config
+        from app.functions.iris import get_patient_list
+        from app.functions.search import select_notes, hybrid_search, normalize_filters
+        from app.functions.shards import shard_patient_ids
+
+        filters = normalize_filters(body.get("filters"))
+        patient_ids = filters["patient_ids"]
+        # The cached index only holds this shard's notes; without it, never read other shards' patients
+        if patient_ids is not None or not load_config()["search"]["cache_index"]:
+            patient_ids = shard_patient_ids(get_patient_list() if patient_ids is None else patient_ids, *self.shard)
+            if not patient_ids:
+                return []
+            filters = {**filters, "patient_ids": patient_ids}
+
+        notes = select_notes(filters)
+        top_notes = hybrid_search(
+            body["query"], notes, k=body.get("k", 3), query_embedding=body.get("query_embedding")
+        )
+        return [
+            {
+                "patient_id": n["patient_id"],
+                "note_id": n["note_id"],
+                "text": n["text"],
+                "score": n["score"]
+            }
+            for n in top_notes
+        ]
+
+
+def serve(shard, shards, host="127.0.0.1", port=0, ready=None, handler=ShardRequestHandler):
+    """Load this shard's index and serve it until interrupted"""
+    # The shard must be known before the configuration is first loaded
+    os.environ["SEARCH_SHARD"] = f"{shard}/{shards}"
+    from app.config.config import load_config
+    from app.functions.index import get_note_index
+
+    if load_config()["search"]["shard"] != (shard, shards):
+        raise RuntimeError("Configuration was loaded before the shard was set")
+
+    index = get_note_index()
+    logger.info(f"Shard {shard}/{shards} holds {len(index)} notes")
+
+    handler = type("BoundShardRequestHandler", (handler,), {"shard": (shard, shards)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    url = f"http://{host}:{server.server_address[1]}"
+    if ready is not None:
+        ready.put(url)
+    logger.info(f"Shard {shard}/{shards} listening at {url}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve one shard of the note index")
+    parser.add_argument("--shard", type=int, required=True, help="Shard index, from 0")
+    parser.add_argument("--shards", type=int, required=True, help="Total number of shards")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    serve(args.shard, args.shards, args.host, args.port)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import json
+import codecs
+from functools import lru_cache
+
+# Bytes read from the stream at a time
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]}:"
+
+
+@lru_cache(maxsize=1)
+def _load_ijson():
+    """ijson is optional; without it the standard library decoder is used"""
+    try:
+        import ijson
+    except ImportError:
+        return None
+    return ijson
+
+
+def json_backend():
+    """Name of the parser iter_json_array uses: "ijson" or "json" """
+    return "json" if _load_ijson() is None else "ijson"
+
+
+class _Reader:
+    """Text buffer over a binary stream that reads more on demand and drops what was consumed"""
+
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def more(self, size=None):
+        """Read at least size more characters (one chunk by default); False at the end of the stream"""
+        if self.exhausted:
+            return False
+        if self.pos:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        target = len(self.text) + (size or 1)
+        while len(self.text) < target:
+            chunk = self.stream.read(self.chunk_size)
+            if not chunk:
+                self.text += self.decoder.decode(b"", final=True)
+                self.exhausted = True
+                break
+            self.text += self.decoder.decode(chunk)
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or "" at the end of the stream"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.more():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the buffer, found {found!r}")
+        self.pos += 1
+
+    def value(self, decoder):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+                # A number cut off by the end of the buffer ("12" of "12.5") only counts once a delimiter follows
+                if self.exhausted or (end < len(self.text) and self.text[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            # Grow geometrically so a large value is not re-decoded once per chunk
+            self.more(max(self.chunk_size, len(self.text) - self.pos))
+
+
+def _iter_array(stream, key, chunk_size):
+    reader = _Reader(stream, chunk_size)
+    decoder = json.JSONDecoder()
+    reader.expect("{")
+    while reader.peek() != "}":
+        if reader.peek() == ",":
+            reader.pos += 1
+        name = reader.value(decoder)
+        reader.expect(":")
+        if name != key:
+            # Other members are decoded and dropped; they are small in a searchset Bundle
+            reader.value(decoder)
+            continue
+
+        reader.expect("[")
+        while reader.peek() != "]":
+            if reader.peek() == ",":
+                reader.pos += 1
+            yield reader.value(decoder)
+        return
+
+
+def iter_json_array(stream, key, chunk_size=CHUNK_SIZE):
+    """
+    Yield the items of the array under key in the JSON object read from a binary
+    stream one at a time, without holding the whole document in memory
+    """
+    ijson = _load_ijson()
+    if ijson is not None:
+        yield from ijson.items(stream, f"{key}.item", use_float=True)
+        return
+    yield from _iter_array(stream, key, chunk_size)
@@ -0,0 +1,235 @@
+import base64
+import logging
+import numpy as np
+
+logger = logging.getLogger("clinical_assistant.quantization")
+
+# Rows scored per block, so that scans never materialize a float copy of all codes
+SCAN_BLOCK_SIZE = 4096
+
+# Vectors sampled to train codebooks
+MAX_TRAINING_VECTORS = 10000
+
+
+def _pack(array):
+    return {"dtype": str(array.dtype), "shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def _unpack(packed):
+    data = np.frombuffer(base64.b64decode(packed["data"]), dtype=packed["dtype"])
+    return data.reshape(packed["shape"]).copy()
+
+
+def normalize(vectors):
+    """L2-normalize rows so that dot products are cosine similarities"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _training_sample(vectors, seed=0):
+    if len(vectors) <= MAX_TRAINING_VECTORS:
+        return vectors
+    rows = np.random.default_rng(seed).choice(len(vectors), MAX_TRAINING_VECTORS, replace=False)
+    return vectors[rows]
+
+
+class TrainingSample:
+    """Uniform sample of at most size vectors from a stream of batches (reservoir sampling)"""
+
+    def __init__(self, size=MAX_TRAINING_VECTORS, seed=0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.seen = 0
+        self.filled = 0
+        self._vectors = None
+
+    def add(self, vectors):
+        start = min(len(vectors), self.size - self.filled)
+        if self._vectors is None or self.filled + start > len(self._vectors):
+            # Grow geometrically up to size, so small corpora do not allocate a full sample
+            capacity = min(self.size, max(2 * (self.filled + start), 1024))
+            grown = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+            if self._vectors is not None:
+                grown[:self.filled] = self._vectors[:self.filled]
+            self._vectors = grown
+        self._vectors[self.filled:self.filled + start] = vectors[:start]
+        self.filled += start
+
+        # Once full, the i-th vector seen replaces a random sampled one with probability size / i
+        rest = vectors[start:]
+        if len(rest):
+            positions = self.rng.integers(0, self.seen + start + np.arange(1, len(rest) + 1))
+            kept = positions < self.size
+            self._vectors[positions[kept]] = rest[kept]
+        self.seen += len(vectors)
+        return self
+
+    def vectors(self):
+        return self._vectors[:self.filled] if self._vectors is not None else np.empty((0, 0), dtype=np.float32)
+
+
+class ScalarQuantizer:
+    """int8 scalar quantization with a per-dimension offset and scale (4x smaller than float32)"""
+
+    def __init__(self, dimensions):
+        self.dimensions = dimensions
+        self.name = "int8"
+        self.offset = None
+        self.scale = None
+
+    def train(self, vectors):
+        sample = _training_sample(vectors)
+        low = sample.min(axis=0)
+        high = sample.max(axis=0)
+        self.scale = np.maximum(high - low, 1e-12).astype(np.float32) / 255
+        self.offset = (low + 128 * self.scale).astype(np.float32)
+        return self
+
+    def encode(self, vectors):
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes):
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def scores(self, query, codes):
+        """Approximate dot products of a query with encoded vectors"""
+        weights = query * self.scale
+        bias = float(query @ self.offset)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCAN_BLOCK_SIZE):
+            block = codes[start:start + SCAN_BLOCK_SIZE]
+            out[start:start + len(block)] = block.astype(np.float32) @ weights + bias
+        return out
+
+    def code_size(self):
+        return self.dimensions
+
+    def to_params(self):
+        return {"offset": _pack(self.offset), "scale": _pack(self.scale)}
+
+    def load_params(self, params):
+        self.offset = _unpack(params["offset"])
+        self.scale = _unpack(params["scale"])
+        return self
+
+
+class ProductQuantizer:
+    """
+    Product quantization: each vector is split into subspaces and every subvector
+    is replaced by the index of its nearest centroid (one byte per subspace)
+    """
+
+    def __init__(self, dimensions, subspaces=48, centroids=256, iterations=10):
+        if dimensions % subspaces:
+            raise ValueError(f"{dimensions} dimensions cannot be split into {subspaces} subspaces")
+        self.dimensions = dimensions
+        self.subspaces = subspaces
+        self.centroids = centroids
+        self.iterations = iterations
+        self.name = f"pq{subspaces}"
+        self.codebooks = None
+
+    def _split(self, vectors):
+        return vectors.reshape(len(vectors), self.subspaces, -1)
+
+    @staticmethod
+    def _nearest(vectors, centroids):
+        # argmin ||x - c||^2 == argmin (||c||^2 - 2 x.c)
+        distances = (centroids * centroids).sum(axis=1) - 2 * vectors @ centroids.T
+        return distances.argmin(axis=1)
+
+    def train(self, vectors):
+        sample = self._split(_training_sample(vectors))
+        rng = np.random.default_rng(0)
+        count = min(self.centroids, len(sample))
+        codebooks = []
+        for s in range(self.subspaces):
+            data = np.ascontiguousarray(sample[:, s, :])
+            centroids = data[rng.choice(len(data), count, replace=False)].copy()
+            for _ in range(self.iterations):
+                assignment = self._nearest(data, centroids)
+                members = np.zeros((len(data), count), dtype=np.float32)
+                members[np.arange(len(data)), assignment] = 1
+                sizes = members.sum(axis=0)
+                # Centroids without members keep their previous position
+                filled = sizes > 0
+                centroids[filled] = (members.T @ data)[filled] / sizes[filled, None]
+            codebooks.append(centroids)
+        self.codebooks = np.stack(codebooks).astype(np.float32)
+        logger.info(f"Trained {self.subspaces}x{count} product quantization codebooks on {len(sample)} vectors")
+        return self
+
+    def encode(self, vectors):
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for start in range(0, len(vectors), SCAN_BLOCK_SIZE):
+            block = self._split(vectors[start:start + SCAN_BLOCK_SIZE])
+            for s in range(self.subspaces):
+                codes[start:start + len(block), s] = self._nearest(block[:, s, :], self.codebooks[s])
+        return codes
+
+    def decode(self, codes):
+        return np.concatenate([self.codebooks[s][codes[:, s]] for s in range(self.subspaces)], axis=1)
+
+    def scores(self, query, codes):
+        """Approximate dot products via per-subspace lookup tables (asymmetric distance)"""
+        tables = np.einsum("skd,sd->sk", self.codebooks, query.reshape(self.subspaces, -1))
+        out = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCAN_BLOCK_SIZE):
+            block = codes[start:start + SCAN_BLOCK_SIZE]
+            for s in range(self.subspaces):
+                out[start:start + len(block)] += tables[s][block[:, s]]
+        return out
+
+    def code_size(self):
+        return self.subspaces
+
+    def to_params(self):
+        return {"codebooks": _pack(self.codebooks)}
+
+    def load_params(self, params):
+        self.codebooks = _unpack(params["codebooks"])
+        return self
+
+
+def create_codec(name, dimensions, subspaces=48):
+    """Create an untrained codec: "int8" or "pq" """
+    if name == "int8":
+        return ScalarQuantizer(dimensions)
+    if name == "pq":
+        return ProductQuantizer(dimensions, subspaces=subspaces)
+    raise ValueError(f"Unknown embedding codec: {name}")
+
+
+class EncodedVectors:
+    """Compressed vectors of one index version, with the codec needed to score them"""
+
+    def __init__(self, codec, codes, codebook_id=None):
+        self.codec = codec
+        self.codes = codes
+        # ID of the stored codebook the codes were encoded with
+        self.codebook_id = codebook_id
+
+    def __len__(self):
+        return len(self.codes)
+
+    def scores(self, query, rows=None):
+        """Approximate cosine similarities of a query with all (or the given rows of the) encoded vectors"""
+        codes = self.codes
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            # Only gather when scanning a subset (e.g. patient partitions) of the index
+            if len(rows) != len(codes) or (rows != np.arange(len(rows))).any():
+                codes = codes[rows]
+        return self.codec.scores(normalize(query), codes)
+
+
+def top_positions(scores, size):
+    """Positions of the size highest scores, best first"""
+    scores = np.asarray(scores)
+    size = min(size, len(scores))
+    if size <= 0:
+        return np.empty(0, dtype=np.int64)
+    best = np.argpartition(-scores, size - 1)[:size]
+    return best[np.argsort(-scores[best], kind="stable")]
@@ -1,61 +1,219 @@
 import re
 
 
-def clean_llm_response(response):
+# Compiled once. The stages of clean_llm_response run in this order, since removing
+# one artifact can create or break a match for a later one
+_TAG = re.compile(r'<[^>]+>')
+_CLOSING_TAG = re.compile(r'</[^>]+>')
+_CODE_BLOCK = re.compile(r'```[^`]*```')
+_PATIENT_DATA = re.compile(r'Patient \d+ has (?:the following|undergone).+?[:\n]')
+_LIST_ITEM = re.compile(r'- [^\n]+\n')
+_PLEASE_NOTE = re.compile(r'Please note that', re.IGNORECASE)
+_QUESTION = re.compile(r'question', re.IGNORECASE)
+_META_PHRASE = re.compile(r'Let me know if this meets|The answer should be|I should', re.IGNORECASE)
+_BASED_ON = re.compile(r'Based on the information provided')
+_ACCORDING_TO = re.compile(r'According to the patient data')
+_COMMA_OR_NEWLINE = re.compile(r'[,\n]')
+_SIGN_OFF = re.compile(r'Best regards,|Sincerely,|Thanks,')
+_DISCLAIMER = re.compile(r'(?:Note|Disclaimer):.*')
+_SENTENCE_END = re.compile(r'[.!?]')
+_WHITESPACE_RUN = re.compile(r'\s{2,}')
+
+EMPTY_RESPONSE = "I couldn't generate a clear answer. Please try rephrasing your question."
+
+
+def _remove_spans(text, start, end, multiline=True, endpos=None):
     """
-    Clean up LLM response text with filtering for system messages,
-    tags, and other unwanted content
+    Same as re.sub(start + '.*?' + end, '', text), with re.DOTALL if multiline, in one scan.
+    Returns (text, open), where open is True if a start was left without an end.
+    """
+    endpos = len(text) if endpos is None else endpos
+    pieces = []
+    kept = search = 0
+    while True:
+        opening = start.search(text, search, endpos)
+        if opening is None:
+            return "".join(pieces) + text[kept:], False
+        closing = end.search(text, opening.end(), endpos)
+        if closing is None:
+            # No later start can find an end either, so do not rescan the rest for each
+            return "".join(pieces) + text[kept:], True
+        if not multiline and closing.group() == "\n":
+            # Nor can any later start on the same line
+            search = closing.end()
+            continue
+        pieces.append(text[kept:opening.start()])
+        kept = search = closing.end()
+
+
+def _strip_artifacts(text, boundary=False):
+    """
+    Remove tags, code, raw patient data, meta-commentary, sign-offs and disclaimers.
+    Returns (text, truncated), where truncated means nothing after text can be part
+    of the answer. With boundary=True text must end at a newline, and (None, False) is
+    returned if text that follows could still change how this part is cleaned.
     """
-    # First, remove all tagged sections
-    response = re.sub(r'<[^>]+>.*?</[^>]+>', '', response, flags=re.DOTALL)
+    # Tagged sections, then any remaining tags. Both end with '>', so the text after
+    # the last one is not scanned again from every '<' in it
+    end = text.rfind(">") + 1
+    if boundary and "<" in text[end:]:
+        return None, False
+    text, open_tag = _remove_spans(text, _TAG, _CLOSING_TAG, endpos=end)
+    end = text.rfind(">") + 1
+    if boundary and (open_tag or "<" in text[end:]):
+        return None, False
+    text = _TAG.sub('', text[:end]) + text[end:]
+
+    # Code blocks, then everything from an unclosed code fence on
+    text = _CODE_BLOCK.sub('', text)
+    fence = text.find("```")
+    if fence >= 0:
+        if boundary:
+            return None, False
+        text = text[:fence]
+
+    # Raw patient data and list items, which end at the last ':' or newline at most
+    end = max(text.rfind(":"), text.rfind("\n")) + 1
+    text = _PATIENT_DATA.sub('', text[:end]) + text[end:]
+    if boundary and text and not text.endswith("\n"):
+        return None, False
+    end = text.rfind("\n") + 1
+    text = _LIST_ITEM.sub('', text[:end]) + text[end:]
+    if boundary and text and not text.endswith("\n"):
+        return None, False
 
-    # Remove any remaining tags
-    response = re.sub(r'<[^>]+>', '', response)
+    # Meta-phrases about answering; the trailing ones cut the rest of the response
+    text, open_note = _remove_spans(text, _PLEASE_NOTE, _QUESTION)
+    if boundary and open_note:
+        return None, False
+    truncated = False
+    match = _META_PHRASE.search(text)
+    if match:
+        text = text[:match.start()]
+        truncated = True
 
-    # Remove code block indicators
-    response = re.sub(r'```[^`]*```', '', response)
-    response = re.sub(r'```.*$', '', response, flags=re.DOTALL)
+    # Self-reflective statements
+    text = _remove_spans(text, _BASED_ON, _COMMA_OR_NEWLINE, multiline=False)[0]
+    text = _remove_spans(text, _ACCORDING_TO, _COMMA_OR_NEWLINE, multiline=False)[0]
 
-    # Remove any text that looks like raw patient data
-    response = re.sub(r'Patient \d+ has (the following|undergone).+?(:|\n)', '', response)
-    response = re.sub(r'- [^\n]+\n', '', response)
+    # Sign-offs
+    match = _SIGN_OFF.search(text)
+    if match:
+        text = text[:match.start()]
+        truncated = True
 
-    # Remove meta-phrases about answering
-    response = re.sub(r'Please note that.*?question', '', response, flags=re.DOTALL | re.IGNORECASE)
-    response = re.sub(r'Let me know if this meets.*', '', response, flags=re.DOTALL | re.IGNORECASE)
-    response = re.sub(r'The answer should be.*', '', response, flags=re.DOTALL | re.IGNORECASE)
-    response = re.sub(r'I should.*', '', response, flags=re.DOTALL | re.IGNORECASE)
+    # Disclaimer-like statements
+    return _DISCLAIMER.sub('', text), truncated
 
-    # Remove self-reflective statements
-    response = re.sub(r'Based on the information provided.*?,', '', response)
-    response = re.sub(r'According to the patient data.*?,', '', response)
 
-    # Remove other standard artifacts
-    response = re.sub(r'Best regards,.*', '', response, flags=re.DOTALL)
-    response = re.sub(r'Sincerely,.*', '', response, flags=re.DOTALL)
-    response = re.sub(r'Thanks,.*', '', response, flags=re.DOTALL)
+def _unique_sentences(parts, seen):
+    """Stripped parts longer than 5 characters that are not in seen, adding them to it"""
+    sentences = []
+    for part in parts:
+        sentence = part.strip()
+        if len(sentence) > 5 and sentence not in seen:
+            seen.add(sentence)
+            sentences.append(sentence)
+    return sentences
 
-    # Remove any disclaimer-like statements
-    response = re.sub(r'Note:.*', '', response)
-    response = re.sub(r'Disclaimer:.*', '', response)
 
-    # Split into sentences and remove duplicates
-    sentences = [s.strip() for s in re.split(r'[.!?]', response) if s.strip()]
-    unique_sentences = []
-    for sentence in sentences:
-        if sentence and sentence not in unique_sentences and len(sentence) > 5:
-            unique_sentences.append(sentence)
+def clean_llm_response(response):
+    """
+    Clean up LLM response text with filtering for system messages,
+    tags, and other unwanted content
+    """
+    text, _ = _strip_artifacts(response)
 
-    # Clean up and rejoin
-    clean_response = '. '.join(unique_sentences)
+    # Split into sentences, remove duplicates and rejoin
+    clean_response = '. '.join(_unique_sentences(_SENTENCE_END.split(text), set()))
     if clean_response and not clean_response.endswith('.'):
         clean_response += '.'
 
     # Final cleanup of any remaining weird artifacts
-    clean_response = re.sub(r'\s{2,}', ' ', clean_response)
+    clean_response = _WHITESPACE_RUN.sub(' ', clean_response)
 
     # Handle empty responses
     if not clean_response or clean_response.isspace():
-        return "I couldn't generate a clear answer. Please try rephrasing your question."
+        return EMPTY_RESPONSE
+
+    return clean_response
+
+
+class ResponseCleaner:
+    """
+    clean_llm_response for a response that arrives in pieces. feed() returns the part
+    of the cleaned answer that later text can no longer change and close() returns the
+    rest; together they equal clean_llm_response() of the whole response.
+    Text is cleaned up to the last newline once no tag, code fence or "Please note
+    that" is still open there, so a long open section is held back until it ends.
+    """
+
+    def __init__(self):
+        self._pending = []
+        self._partial = ""  # cleaned text after the last sentence end
+        self._seen = set()
+        self._started = False
+        self._truncated = False
+
+    def _emit(self, text, final=False):
+        parts = _SENTENCE_END.split(self._partial + text)
+        self._partial = "" if final else parts.pop()
+        sentences = _unique_sentences(parts, self._seen)
+        if not sentences:
+            return ""
+        chunk = '. '.join(_WHITESPACE_RUN.sub(' ', s) for s in sentences)
+        if self._started:
+            chunk = '. ' + chunk
+        self._started = True
+        return chunk
 
-    return clean_response
\ No newline at end of file
+    def feed(self, token):
+        """Add the next piece of the response and return newly final cleaned text"""
+        if self._truncated:
+            return ""
+        self._pending.append(token)
+        if "\n" not in token:
+            return ""
+
+        pending = "".join(self._pending)
+        cut = pending.rfind("\n") + 1
+        text, self._truncated = _strip_artifacts(pending[:cut], boundary=True)
+        if text is None:
+            self._pending = [pending]
+            return ""
+        self._pending = [pending[cut:]]
+        return self._emit(text)
+
+    def close(self):
+        """Clean the rest of the response and return the end of the answer"""
+        text = ""
+        if not self._truncated:
+            text, _ = _strip_artifacts("".join(self._pending))
+        self._pending = []
+        chunk = self._emit(text, final=True)
+        if not self._started:
+            return EMPTY_RESPONSE
+        return chunk + '.'
+
+
+# Header phrases written by the summarize_* functions, by FHIR resource type
+NOTE_SECTION_HEADERS = {
+    "Condition": "has the following conditions:",
+    "Medication": "is taking the following medications:",
+    "Procedure": "has undergone the following procedures:",
+}
+
+
+def split_note_sections(note_text):
+    """
+    Split a patient summary note into its condition, medication and procedure
+    sections, keyed by resource type
+    """
+    sections = {}
+    for block in note_text.split("\n\n"):
+        header = block.split("\n", 1)[0]
+        for resource_type, phrase in NOTE_SECTION_HEADERS.items():
+            if header.endswith(phrase):
+                sections[resource_type] = block
+                break
+    return sections
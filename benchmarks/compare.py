@@ -0,0 +1,59 @@
+import sys
+import json
+import argparse
+
+
+def load_results(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare(baseline, candidate, metric="mean_ms"):
+    """Return rows of (stage, baseline value, candidate value, relative change in %)"""
+    rows = []
+    stages = list(baseline.get("stages", {}))
+    stages += [s for s in candidate.get("stages", {}) if s not in stages]
+    for stage in stages:
+        before = baseline.get("stages", {}).get(stage, {}).get(metric)
+        after = candidate.get("stages", {}).get(stage, {}).get(metric)
+        if before and after is not None:
+            change = (after - before) / before * 100
+        else:
+            change = None
+        rows.append((stage, before, after, change))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="mean_ms", help="Per-stage metric to compare (default: mean_ms)")
+    parser.add_argument("--fail-above", type=float, default=None,
+                        help="Exit with status 1 if any stage regresses by more than this percentage")
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    candidate = load_results(args.candidate)
+
+    if baseline.get("params") != candidate.get("params"):
+        print("Warning: benchmark parameters differ between the two runs\n")
+
+    def fmt(value):
+        return "-" if value is None else f"{value:.3f}"
+
+    print(f"{'stage':<24}{'baseline':>14}{'candidate':>14}{'change':>10}")
+    regressions = []
+    for stage, before, after, change in compare(baseline, candidate, args.metric):
+        change_text = "-" if change is None else f"{change:+.1f}%"
+        print(f"{stage:<24}{fmt(before):>14}{fmt(after):>14}{change_text:>10}")
+        if args.fail_above is not None and change is not None and change > args.fail_above:
+            regressions.append(stage)
+
+    if regressions:
+        print(f"\nRegressions above {args.fail_above}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import importlib
+import argparse
+import resource
+import tracemalloc
+import multiprocessing
+
+# Add parent directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import parse_scale, timed
+from benchmarks.fhir_server import start_server
+from benchmarks.synthetic import make_resources, make_bundle
+
+logger = logging.getLogger("clinical_assistant.bench.fhir_parsing")
+
+RESOURCE_TYPES = ["Condition", "Medication", "Procedure"]
+
+
+def dict_path(base_url):
+    """The previous ingest path: whole Bundles through response.json(), every resource dict kept"""
+    import requests
+    from app.functions.fhir import RECORD_EXTRACTORS, summarize_conditions, summarize_medications, summarize_procedures
+
+    response = requests.get(f"{base_url}/Patient")
+    response.raise_for_status()
+    patients = [entry["resource"] for entry in response.json().get("entry", [])]
+
+    summaries = []
+    for patient in patients:
+        pid = patient["id"]
+        data = {}
+        for resource_type in RESOURCE_TYPES:
+            response = requests.get(f"{base_url}/{resource_type}?subject=Patient/{pid}")
+            response.raise_for_status()
+            data[resource_type] = [entry["resource"] for entry in response.json().get("entry", [])]
+        facts = {t: [RECORD_EXTRACTORS[t](r) for r in data[t]] for t in RESOURCE_TYPES}
+        text = "\n\n".join(filter(None, [
+            summarize_conditions(pid, facts["Condition"]),
+            summarize_medications(pid, facts["Medication"]),
+            summarize_procedures(pid, facts["Procedure"])
+        ]))
+        if text:
+            # Extracted facts used to be kept as dicts
+            summaries.append({
+                "patient_id": pid,
+                "note_text": text,
+                "facts": {t: [r.to_dict() for r in records] for t, records in facts.items()}
+            })
+    return summaries
+
+
+def stream_path(base_url):
+    from app.functions.fhir import process_patients
+
+    summaries, _ = process_patients()
+    return summaries
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process"""
+    # VmHWM starts over at exec, unlike ru_maxrss which a spawned child inherits from its parent
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_path(name, base_url, results):
+    """Child process: ingest every patient with one path and report peak RSS and throughput"""
+    os.environ["FHIR_BASE_URL"] = base_url
+    logging.basicConfig(level=logging.WARNING)
+    # Warm-up import, so loading the modules is not part of the measurement
+    importlib.import_module("app.functions.fhir")
+
+    baseline = peak_rss_mb()
+    summaries, seconds = timed(dict_path if name == "dict" else stream_path, base_url)
+    peak = peak_rss_mb()
+    results.put({
+        "path": name,
+        "summaries": len(summaries),
+        "seconds": round(seconds, 3),
+        "patients_per_s": round(len(summaries) / seconds, 1) if seconds else None,
+        "peak_rss_mb": round(peak, 1),
+        "rss_growth_mb": round(peak - baseline, 1),
+        "notes_sha1": hashlib.sha1("\n".join(s["note_text"] for s in summaries).encode("utf-8")).hexdigest()
+    })
+
+
+def make_payload(resources):
+    """One large searchset Bundle of mixed Condition, MedicationStatement and Procedure resources"""
+    entries = []
+    index = 0
+    while len(entries) < resources:
+        for resource_type in RESOURCE_TYPES:
+            entries.extend(make_resources(resource_type, index))
+        index += 1
+    return json.dumps(make_bundle(entries[:resources])).encode("utf-8")
+
+
+def parse_bundle(payload, streaming):
+    """Records of all entries of a Bundle, parsed whole with json.loads or streamed"""
+    from app.functions.fhir import RECORD_EXTRACTORS
+    from app.utils.json_stream import iter_json_array
+
+    extract = {"Condition": RECORD_EXTRACTORS["Condition"], "MedicationStatement": RECORD_EXTRACTORS["Medication"],
+               "Procedure": RECORD_EXTRACTORS["Procedure"]}
+    if streaming:
+        entries = iter_json_array(io.BytesIO(payload), "entry")
+    else:
+        entries = json.loads(payload).get("entry", [])
+    return [extract[e["resource"]["resourceType"]](e["resource"]) for e in entries]
+
+
+def measure_parse(payload, streaming, repeat):
+    """Throughput and peak traced memory of parsing one Bundle"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = parse_bundle(payload, streaming)
+        durations.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    parse_bundle(payload, streaming)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(durations)
+    return {
+        "records": len(records),
+        "best_s": round(best, 4),
+        "mb_per_s": round(len(payload) / best / 2 ** 20, 1),
+        "records_per_s": round(len(records) / best),
+        "peak_traced_mb": round(peak / 2 ** 20, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare whole-Bundle and streaming FHIR parsing")
+    parser.add_argument("--patients", type=parse_scale, default=2000,
+                        help="Number of synthetic patients, or one of: 1k, 10k, 100k, 1m")
+    parser.add_argument("--history", type=int, default=10,
+                        help="Repeat each patient's records this many times to simulate long histories")
+    parser.add_argument("--bundle-resources", type=int, default=100_000,
+                        help="Resources in the Bundle used for the parse-only comparison")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    from app.utils.json_stream import json_backend
+
+    results = {"params": vars(args), "json_backend": json_backend()}
+
+    logger.info(f"Parsing a Bundle of {args.bundle_resources} resources")
+    payload = make_payload(args.bundle_resources)
+    results["parse"] = {
+        "bundle_mb": round(len(payload) / 2 ** 20, 1),
+        "dict": measure_parse(payload, False, args.repeat),
+        "stream": measure_parse(payload, True, args.repeat)
+    }
+    del payload
+
+    server, base_url = start_server(args.patients, history=args.history)
+    try:
+        # A fresh process per path, since peak RSS never goes down
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        for name in ["dict", "stream"]:
+            logger.info(f"Ingesting {args.patients} patients with the {name} path")
+            process = context.Process(target=run_path, args=(name, base_url, queue))
+            process.start()
+            results[name] = queue.get()
+            process.join()
+    finally:
+        server.terminate()
+    results["same_notes"] = results["dict"]["notes_sha1"] == results["stream"]["notes_sha1"]
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# Add parent directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import make_patient, make_resources, make_bundle, patient_index
+
+logger = logging.getLogger("clinical_assistant.bench.fhir_server")
+
+BASE_PATH = "/fhir/r4"
+
+
+class StubFHIRHandler(BaseHTTPRequestHandler):
+    """Serve synthetic FHIR searchset Bundles generated on demand"""
+
+    num_patients = 0
+    seed = 0
+    history = 1
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/fhir+json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream_patients(self):
+        # The Patient bundle can hold a million entries, so write it entry by entry
+        self.send_response(200)
+        self.send_header("Content-Type", "application/fhir+json")
+        self.end_headers()
+        head = {"resourceType": "Bundle", "type": "searchset", "total": self.num_patients}
+        self.wfile.write(json.dumps(head)[:-1].encode("utf-8") + b', "entry": [')
+        buffer = []
+        for index in range(self.num_patients):
+            if index:
+                buffer.append(",")
+            buffer.append(json.dumps({"resource": make_patient(index, seed=self.seed)}))
+            if len(buffer) >= 2000:
+                self.wfile.write("".join(buffer).encode("utf-8"))
+                buffer = []
+        buffer.append("]}")
+        self.wfile.write("".join(buffer).encode("utf-8"))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if not url.path.startswith(BASE_PATH + "/"):
+            self._send_json(404, {"resourceType": "OperationOutcome"})
+            return
+
+        resource_type = url.path[len(BASE_PATH) + 1:].strip("/")
+        if resource_type == "Patient":
+            self._stream_patients()
+            return
+
+        params = parse_qs(url.query)
+        subject = (params.get("subject") or params.get("patient") or [""])[0]
+        index = patient_index(subject.split("/")[-1])
+        if index is None or index >= self.num_patients:
+            self._send_json(200, make_bundle([]))
+            return
+
+        resources = make_resources(resource_type, index, seed=self.seed)
+        if self.history > 1:
+            # Repeat the records to simulate patients with long histories
+            resources = [dict(r, id=f"{r['id']}-{n}") for n in range(self.history) for r in resources]
+        self._send_json(200, make_bundle(resources))
+
+
+def serve(num_patients, seed=0, host="127.0.0.1", port=0, ready=None, history=1):
+    """Run the stub FHIR server until interrupted"""
+    handler = type(
+        "BoundStubFHIRHandler", (StubFHIRHandler,),
+        {"num_patients": num_patients, "seed": seed, "history": history}
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    base_url = f"http://{host}:{server.server_address[1]}{BASE_PATH}"
+    if ready is not None:
+        ready.put(base_url)
+    logger.info(f"Stub FHIR server with {num_patients} patients at {base_url}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def start_server(num_patients, seed=0, host="127.0.0.1", port=0, history=1):
+    """Start the stub FHIR server in a child process and return (process, base_url)"""
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=serve, args=(num_patients, seed, host, port, ready, history), daemon=True
+    )
+    process.start()
+    base_url = ready.get(timeout=30)
+    return process, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic FHIR data for benchmarks")
+    parser.add_argument("--patients", type=int, default=1000, help="Number of synthetic patients")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic data")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--history", type=int, default=1, help="Repeat each patient's records this many times")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    serve(args.patients, seed=args.seed, host=args.host, port=args.port, history=args.history)
+
+
+if __name__ == "__main__":
+    main()
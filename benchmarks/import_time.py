@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import statistics
+import subprocess
+
+logger = logging.getLogger("clinical_assistant.bench.import_time")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry points whose import cost is paid before the app can do anything
+DEFAULT_TARGETS = ["app.api.routes", "app.cli", "scripts.setup_database"]
+
+# Heavy packages that must only be imported when they are first used
+DEFAULT_FORBIDDEN = ["torch", "sentence_transformers", "transformers", "huggingface_hub"]
+
+
+def measure_import(module, python=sys.executable):
+    """Import a module in a fresh interpreter under -X importtime and parse the report"""
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        imports.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+
+    top_level = next((i for i in imports if i["module"] == module), None)
+    return {
+        "total_ms": top_level["cumulative_us"] / 1000 if top_level else 0.0,
+        "modules": {i["module"] for i in imports},
+        "imports": imports,
+    }
+
+
+def benchmark_target(module, repeat, forbidden, top):
+    """Measure a target several times and summarize the median run"""
+    runs = [measure_import(module) for _ in range(repeat)]
+    totals = [run["total_ms"] for run in runs]
+    median_run = sorted(runs, key=lambda run: run["total_ms"])[len(runs) // 2]
+    slowest = sorted(median_run["imports"], key=lambda i: i["self_us"], reverse=True)[:top]
+    return {
+        "median_ms": round(statistics.median(totals), 3),
+        "min_ms": round(min(totals), 3),
+        "max_ms": round(max(totals), 3),
+        "modules_imported": len(median_run["modules"]),
+        "forbidden_imported": sorted(
+            name for name in forbidden
+            if any(m == name or m.startswith(name + ".") for m in median_run["modules"])
+        ),
+        "slowest_self_ms": [
+            {"module": i["module"], "self_ms": round(i["self_us"] / 1000, 3)} for i in slowest
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Track process startup cost with python -X importtime")
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS, help="Modules to import")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest modules to report")
+    parser.add_argument("--forbid", default=",".join(DEFAULT_FORBIDDEN),
+                        help="Comma-separated packages that must not be imported at startup")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="Fail if the median import time of any target exceeds this budget")
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    forbidden = [name for name in args.forbid.split(",") if name]
+    results = {
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "targets": {t: benchmark_target(t, args.repeat, forbidden, args.top) for t in args.targets},
+    }
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    for target, summary in results["targets"].items():
+        logger.info(f"{target}: median {summary['median_ms']} ms, {summary['modules_imported']} modules")
+        if summary["forbidden_imported"]:
+            failures.append(f"{target} imports {', '.join(summary['forbidden_imported'])} at startup")
+        if args.max_ms is not None and summary["median_ms"] > args.max_ms:
+            failures.append(f"{target} takes {summary['median_ms']} ms to import (budget {args.max_ms} ms)")
+
+    for failure in failures:
+        logger.error(failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("clinical_assistant.bench.inference_server")
+
+
+class StubInferenceHandler(BaseHTTPRequestHandler):
+    """Emulate the Hugging Face text-generation endpoint with configurable latency and hangs"""
+
+    latency = 0.0
+    hang_first = False
+    hang_seconds = 60.0
+    state = None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        # Counters for the load tests
+        with self.state["lock"]:
+            self._send_json({k: v for k, v in self.state.items() if k not in ("lock", "seen")})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = body.get("inputs", "")
+
+        with self.state["lock"]:
+            self.state["requests"] += 1
+            self.state["in_flight"] += 1
+            self.state["max_in_flight"] = max(self.state["max_in_flight"], self.state["in_flight"])
+            first_attempt = prompt not in self.state["seen"]
+            self.state["seen"].add(prompt)
+
+        try:
+            # Simulate a stuck replica: the first attempt at each prompt hangs, retries succeed
+            if self.hang_first and first_attempt:
+                time.sleep(self.hang_seconds)
+            elif self.latency:
+                time.sleep(self.latency)
+            digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+            self._send_json([{"generated_text": f"Stub answer {digest}."}])
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self.state["lock"]:
+                self.state["in_flight"] -= 1
+
+
+def serve(host="127.0.0.1", port=0, latency=0.0, hang_first=False, hang_seconds=60.0, ready=None):
+    """Run the stub inference server until interrupted"""
+    state = {"lock": threading.Lock(), "seen": set(), "requests": 0, "in_flight": 0, "max_in_flight": 0}
+    handler = type("BoundStubInferenceHandler", (StubInferenceHandler,), {
+        "latency": latency, "hang_first": hang_first, "hang_seconds": hang_seconds, "state": state
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    url = f"http://{host}:{server.server_address[1]}"
+    if ready is not None:
+        ready.put(url)
+    logger.info(f"Stub inference server at {url}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def start_server(latency=0.0, hang_first=False, hang_seconds=60.0, host="127.0.0.1", port=0):
+    """Start the stub inference server in a child process and return (process, url)"""
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=serve, args=(host, port, latency, hang_first, hang_seconds, ready), daemon=True
+    )
+    process.start()
+    return process, ready.get(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stub Hugging Face text-generation endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per generation")
+    parser.add_argument("--hang-first", action="store_true", help="Make the first attempt at each prompt hang")
+    parser.add_argument("--hang-seconds", type=float, default=60.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    serve(args.host, args.port, args.latency, args.hang_first, args.hang_seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.inference_server import start_server
+from benchmarks.run import summarize_timings
+
+logger = logging.getLogger("clinical_assistant.bench.llm_gateway")
+
+
+def upstream_stats(url):
+    return requests.get(url, timeout=5).json()
+
+
+def burst(gateway, prompts, url, workers):
+    """Send all prompts at once and record per-request outcome and latency"""
+    def one(prompt):
+        start = time.perf_counter()
+        try:
+            gateway.generate(prompt, model=url, max_length=32, temperature=0.7, top_p=0.9)
+            outcome = "ok"
+        except Exception as e:
+            outcome = type(e).__name__
+        return outcome, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(one, prompts))
+
+    outcomes = {}
+    for outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    by_outcome = {
+        outcome: summarize_timings([d for o, d in results if o == outcome]) for outcome in outcomes
+    }
+    return outcomes, by_outcome
+
+
+def scenario_coalescing(LLMGateway, call, args):
+    process, url = start_server(latency=args.latency)
+    try:
+        gateway = LLMGateway(call, max_concurrency=4, timeout=10, queue_timeout=5)
+        outcomes, timings = burst(gateway, ["same prompt"] * args.requests, url, args.requests)
+        upstream = upstream_stats(url)
+    finally:
+        process.terminate()
+    return {
+        "outcomes": outcomes,
+        "timings": timings,
+        "gateway": gateway.stats,
+        "upstream_requests": upstream["requests"],
+        "passed": upstream["requests"] == 1 and outcomes.get("ok") == args.requests,
+    }
+
+
+def scenario_admission(LLMGateway, call, args):
+    results = {}
+    # A cold gateway, assuming the queue deadline or the actual latency until a call completes
+    for name, prior_latency in (("default_prior", None), ("known_latency", args.latency)):
+        process, url = start_server(latency=args.latency)
+        try:
+            gateway = LLMGateway(call, max_concurrency=2, timeout=10, queue_timeout=args.latency * 2,
+                                 prior_latency=prior_latency)
+            prompts = [f"prompt {i}" for i in range(args.requests)]
+            outcomes, timings = burst(gateway, prompts, url, args.requests)
+            upstream = upstream_stats(url)
+        finally:
+            process.terminate()
+        shed = timings.get("LLMOverloadedError", {})
+        served = timings.get("ok", {})
+        results[name] = {
+            "outcomes": outcomes,
+            "timings": timings,
+            "gateway": gateway.stats,
+            "upstream_max_in_flight": upstream["max_in_flight"],
+            # Shed requests must fail fast (most of them right away), admitted ones must start within
+            # the queue deadline, and the cap must hold
+            "passed": upstream["max_in_flight"] <= 2 and bool(shed) and bool(served)
+                      and shed["max_ms"] <= (args.latency * 2 + 0.5) * 1000
+                      and shed["p50_ms"] <= args.latency * 1000 / 2
+                      and served["max_ms"] <= (args.latency * 3 + 0.5) * 1000,
+        }
+    # Every request that can start before the deadline is served: two at once, then two more after
+    # one latency (the next ones would only start at the deadline)
+    results["passed"] = all(r["passed"] and r["outcomes"].get("ok", 0) >= 4 for r in results.values())
+    return results
+
+
+def scenario_hedging(LLMGateway, call, args):
+    process, url = start_server(latency=args.latency / 10, hang_first=True, hang_seconds=args.latency * 20)
+    try:
+        results = {}
+        for name, hedge_after in (("without_hedge", 0.0), ("with_hedge", args.latency)):
+            gateway = LLMGateway(call, max_concurrency=8, timeout=args.latency * 5,
+                                 hedge_after=hedge_after, queue_timeout=5)
+            prompts = [f"{name} prompt {i}" for i in range(10)]
+            outcomes, timings = burst(gateway, prompts, url, 1)
+            results[name] = {"outcomes": outcomes, "timings": timings, "gateway": gateway.stats}
+    finally:
+        process.terminate()
+    # Every first attempt hangs, so only hedged requests can finish within the deadline
+    results["passed"] = (results["with_hedge"]["outcomes"].get("ok") == 10
+                         and not results["without_hedge"]["outcomes"].get("ok"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify LLM request management against a stub inference server")
+    parser.add_argument("--requests", type=int, default=32, help="Concurrent requests per burst")
+    parser.add_argument("--latency", type=float, default=0.3, help="Stub generation latency in seconds")
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    # Upstream calls must give up well before the stub's hangs end
+    os.environ["LLM_TIMEOUT"] = str(args.latency * 5)
+    from app.functions.llm import _hf_text_generation
+    from app.functions.llm_gateway import LLMGateway
+
+    results = {
+        "coalescing": scenario_coalescing(LLMGateway, _hf_text_generation, args),
+        "admission_control": scenario_admission(LLMGateway, _hf_text_generation, args),
+        "hedging": scenario_hedging(LLMGateway, _hf_text_generation, args),
+    }
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = [name for name, result in results.items() if not result["passed"]]
+    if failed:
+        logger.error(f"Failed scenarios: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+
+# Add parent directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import summarize_timings
+from benchmarks.synthetic import make_conditions, make_medication_statements, make_queries
+
+logger = logging.getLogger("clinical_assistant.bench.local_llm")
+
+
+def build_prompts(count, seed=0):
+    """Build answer_query prompts over synthetic patients"""
+    from app.functions.fhir import extract_condition, extract_medication, summarize_conditions, summarize_medications
+    from app.functions.llm import ANSWER_PROMPT_PREFIX, ANSWER_PROMPT_TEMPLATE
+
+    prompts = []
+    for i, query in enumerate(make_queries(count, count, seed=seed)):
+        pid = str(i + 1)
+        context = "\n\n".join(filter(None, [
+            summarize_conditions(pid, [extract_condition(c) for c in make_conditions(i, seed=seed)]),
+            summarize_medications(pid, [extract_medication(m) for m in make_medication_statements(i, seed=seed)])
+        ]))
+        prompts.append(ANSWER_PROMPT_PREFIX + ANSWER_PROMPT_TEMPLATE.format(
+            context=f"[Patient {pid}]\n{context}", query=query
+        ))
+    return ANSWER_PROMPT_PREFIX, prompts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare local generation with and without the shared-prefix KV cache"
+    )
+    parser.add_argument("--backend", choices=["llama_cpp", "transformers"], default="llama_cpp")
+    parser.add_argument("--model-path", required=True, help="GGUF file (llama_cpp) or model directory/name")
+    parser.add_argument("--prompts", type=int, default=10)
+    parser.add_argument("--max-tokens", type=int, default=16)
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    from app.functions.local_llm import create_local_backend
+
+    backend = create_local_backend({
+        "backend": args.backend,
+        "model": args.model_path,
+        "model_path": args.model_path,
+        "context_size": 4096,
+        "threads": None
+    })
+    prefix, prompts = build_prompts(args.prompts)
+
+    # Greedy decoding so both runs produce the same tokens
+    results = {"params": vars(args)}
+    for name, use_prefix in (("full_prefill", False), ("cached_prefix", True)):
+        durations = []
+        for prompt in prompts:
+            if not use_prefix and hasattr(backend, "llm"):
+                # llama.cpp reuses whatever prefix is still in its context, so start empty
+                backend.llm.reset()
+            start = time.perf_counter()
+            backend.generate(prompt, args.max_tokens, 0.0, 1.0, prefix=prefix if use_prefix else None)
+            durations.append(time.perf_counter() - start)
+        results[name] = summarize_timings(durations)
+
+    results["prefix_cache"] = {"hits": backend.prefix_cache.hits, "misses": backend.prefix_cache.misses}
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tracemalloc
+
+# Add parent directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.run import parse_scale, summarize_timings, timed
+from app.utils.quantization import create_codec, normalize, top_positions
+from app.utils.similarity import cosine_similarity
+
+logger = logging.getLogger("clinical_assistant.bench.quantization")
+
+
+def make_vectors(count, dimensions, clusters=256, seed=0):
+    """Clustered unit vectors, a rough stand-in for note embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dimensions)).astype(np.float32)
+    return normalize(vectors)
+
+
+def json_list_bytes(dimensions, samples=1000):
+    """Memory of one embedding in the current form: a list of boxed floats parsed from JSON"""
+    payload = json.dumps(np.random.default_rng(1).standard_normal(dimensions).tolist())
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [json.loads(payload) for _ in range(samples)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / samples
+
+
+def recall(found, expected):
+    return len(set(found) & set(expected)) / len(expected)
+
+
+def run_codec(name, vectors, queries, truth, args):
+    """Train, encode and search with one codec; report memory, latency and recall@k"""
+    codec = create_codec(name, vectors.shape[1], subspaces=args.pq_subspaces)
+    _, train_s = timed(codec.train, vectors)
+    codes, encode_s = timed(codec.encode, vectors)
+
+    durations = []
+    scan_recall = []
+    rescored_recall = []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        approximate = codec.scores(query, codes)
+        shortlist = top_positions(approximate, max(args.k, args.rescore))
+        # Exact re-scoring; in the app the shortlist embeddings are fetched from IRIS by NoteID
+        exact = vectors[shortlist] @ query
+        found = shortlist[top_positions(exact, args.k)]
+        durations.append(time.perf_counter() - start)
+
+        scan_recall.append(recall(top_positions(approximate, args.k), expected))
+        rescored_recall.append(recall(found, expected))
+
+    return {
+        "bytes_per_note": codes.nbytes / len(codes),
+        "mb_per_million_notes": round(codes.nbytes / len(codes), 1),
+        "codebook_kb": round(len(json.dumps(codec.to_params())) / 1024, 1),
+        "train_s": round(train_s, 3),
+        "encode_s": round(encode_s, 3),
+        "query": summarize_timings(durations),
+        f"recall@{args.k}_scan_only": round(float(np.mean(scan_recall)), 4),
+        f"recall@{args.k}": round(float(np.mean(rescored_recall)), 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory, latency and recall of the embedding codecs")
+    parser.add_argument("--notes", type=parse_scale, default=100_000,
+                        help="Number of vectors, or one of: 1k, 10k, 100k, 1m")
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, default=100, help="Shortlist size re-scored exactly")
+    parser.add_argument("--pq-subspaces", type=int, default=48)
+    parser.add_argument("--codecs", default="int8,pq")
+    parser.add_argument("--python-queries", type=int, default=3,
+                        help="Queries timed with the current pure-Python cosine_similarity scan")
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    logger.info(f"Generating {args.notes} vectors with {args.dimensions} dimensions")
+    vectors = make_vectors(args.notes, args.dimensions)
+    rng = np.random.default_rng(2)
+    queries = normalize(vectors[rng.integers(0, len(vectors), args.queries)]
+                        + 0.3 * rng.standard_normal((args.queries, args.dimensions)).astype(np.float32))
+
+    # Ground truth: exact cosine similarity (vectors are unit length, so a dot product)
+    truth = [top_positions(vectors @ q, args.k) for q in queries]
+
+    results = {"params": vars(args), "codecs": {}}
+
+    float_durations = [timed(lambda q: top_positions(vectors @ q, args.k), q)[1] for q in queries]
+    results["codecs"]["float32"] = {
+        "bytes_per_note": vectors.nbytes / len(vectors),
+        "mb_per_million_notes": round(vectors.nbytes / len(vectors), 1),
+        "query": summarize_timings(float_durations),
+        f"recall@{args.k}": 1.0
+    }
+
+    # The current search path: JSON lists of Python floats scored with cosine_similarity
+    python_count = min(args.python_queries, len(queries))
+    if python_count:
+        logger.info(f"Timing {python_count} pure-Python cosine_similarity scans")
+        embeddings = vectors.tolist()
+        durations = []
+        matches = []
+        for q, expected in zip(queries[:python_count], truth):
+            query = q.tolist()
+            start = time.perf_counter()
+            scores = [cosine_similarity(query, e) for e in embeddings]
+            found = top_positions(scores, args.k)
+            durations.append(time.perf_counter() - start)
+            matches.append(recall(found, expected))
+        del embeddings
+        list_bytes = json_list_bytes(args.dimensions)
+        results["codecs"]["json_list"] = {
+            "bytes_per_note": round(list_bytes, 1),
+            "mb_per_million_notes": round(list_bytes, 1),
+            "query": summarize_timings(durations),
+            f"recall@{args.k}": round(float(np.mean(matches)), 4)
+        }
+
+    for name in args.codecs.split(","):
+        logger.info(f"Benchmarking {name}")
+        results["codecs"][name] = run_codec(name, vectors, queries, truth, args)
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
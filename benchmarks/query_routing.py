@@ -0,0 +1,119 @@
+import os
+import sys
+import json
+import logging
+import argparse
+
+# Add parent directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import install_stubs
+
+logger = logging.getLogger("clinical_assistant.bench.query_routing")
+
+CURRENT = ("active", "recurrence", "relapse")
+
+# (question, expected (resource type, status, term), or None if it must go to the RAG pipeline)
+CASES = [
+    ("Which patients have hyperlipidemia?", ("Condition", CURRENT, "hyperlipidemia")),
+    ("Which patients has asthma", ("Condition", CURRENT, "asthma")),
+    ("Which patients suffer from migraine?", ("Condition", CURRENT, "migraine")),
+    ("How many patients have active asthma?", ("Condition", CURRENT, "asthma")),
+    ("Which patients are diagnosed with asthma?", ("Condition", None, "asthma")),
+    ("Which patients were diagnosed with type 2 diabetes?", ("Condition", None, "type 2 diabetes")),
+    ("Which patients have been diagnosed with asthma?", ("Condition", None, "asthma")),
+    ("How many patients have ever been diagnosed with hypertension?", ("Condition", None, "hypertension")),
+    ("Which patients have been diagnosed with active asthma?", ("Condition", CURRENT, "asthma")),
+    ("Which patients are on metformin?", ("Medication", "active", "metformin")),
+    ("Which patients take lisinopril?", ("Medication", "active", "lisinopril")),
+    ("Which patients have been prescribed atorvastatin?", ("Medication", None, "atorvastatin")),
+    ("Which patients have had an appendectomy?", ("Procedure", None, "appendectomy")),
+    ("Which patients underwent colonoscopy?", ("Procedure", None, "colonoscopy")),
+    ("Which patients have asthma and hypertension?", None),
+    ("Which patients have been diagnosed with asthma but not hypertension?", None),
+    ("What conditions does patient 12 have?", None),
+]
+
+
+def check_parsing():
+    """Compare parse_query with the expected lookup of every case; return the mismatches"""
+    from app.functions.router import parse_query
+
+    mismatches = []
+    for question, expected in CASES:
+        lookup = parse_query(question)
+        found = None if lookup is None else (lookup["resource_type"], lookup["status"], lookup["term"])
+        if found != expected:
+            mismatches.append({"question": question, "expected": expected, "found": found})
+    return mismatches
+
+
+def check_answers(patients):
+    """
+    Answer condition questions from the fact tables of a synthetic cohort and compare the
+    patients with the statuses stored for them; return the mismatches
+    """
+    from scripts.setup_database import setup_tables
+    from benchmarks.sharding import make_summaries
+    from benchmarks.synthetic import make_conditions, patient_id
+    from app.functions.fhir import extract_condition
+    from app.functions.iris import store_patient_facts
+    from app.functions.router import route_query
+
+    setup_tables()
+    summaries = []
+    conditions = {}
+    for i, summary in enumerate(make_summaries(patients)):
+        facts = [extract_condition(c) for c in make_conditions(i)]
+        summaries.append({**summary, "facts": {"Condition": facts}})
+        for fact in facts:
+            conditions.setdefault(fact.name.lower(), []).append((patient_id(i), fact.status))
+    store_patient_facts(summaries)
+
+    mismatches = []
+    for name, rows in sorted(conditions.items()):
+        for question, statuses in ((f"Which patients have {name}?", CURRENT),
+                                   (f"Which patients have been diagnosed with {name}?", None)):
+            expected = {pid for pid, status in rows if statuses is None or status in statuses}
+            routed = route_query(question)
+            found = set() if routed is None else {s["patient_id"] for s in routed[1]}
+            noted = routed is not None and "resolved and inactive" in routed[0]
+            if found != expected or noted != (statuses is None and bool(expected)):
+                mismatches.append({"question": question, "expected": sorted(expected), "found": sorted(found)})
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check which questions the SQL fast path answers, and how")
+    parser.add_argument("--patients", type=int, default=30)
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    install_stubs()
+
+    parsing = check_parsing()
+    answers = check_answers(args.patients)
+    results = {
+        "params": vars(args),
+        "cases": len(CASES),
+        "parse_mismatches": parsing,
+        "answer_mismatches": answers,
+        "passed": not parsing and not answers
+    }
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 0 if results["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
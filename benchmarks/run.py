@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import resource
+import subprocess
+from datetime import datetime, timezone
+
+# Add parent directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fhir_server import start_server
+from benchmarks.stubs import install_stubs
+from benchmarks.synthetic import make_queries, patient_id
+
+logger = logging.getLogger("clinical_assistant.bench")
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def parse_scale(value):
+    """Accept a named scale (1k, 10k, 100k, 1m) or a plain patient count"""
+    key = value.lower()
+    if key in SCALES:
+        return SCALES[key]
+    count = int(value)
+    if count <= 0:
+        raise argparse.ArgumentTypeError("patient count must be positive")
+    return count
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize_timings(durations, items=None):
+    """Summarize a list of durations (seconds) as a JSON-friendly dict"""
+    ordered = sorted(durations)
+    total = sum(ordered)
+    count = items if items is not None else len(ordered)
+    return {
+        "count": count,
+        "total_s": round(total, 6),
+        "mean_ms": round(total / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        "throughput_per_s": round(count / total, 3) if total > 0 else None,
+    }
+
+
+def timed(fn, *args, **kwargs):
+    """Run fn and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(args):
+    """Run the end-to-end pipeline against the local stand-ins and return the results"""
+    results = {
+        "meta": {
+            "label": args.label,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "params": {
+            "patients": args.patients,
+            "seed": args.seed,
+            "queries": args.queries,
+            "k": args.k,
+            "embedding": args.embedding,
+            "llm_latency_s": args.llm_latency,
+        },
+        "stages": {},
+    }
+    stages = results["stages"]
+
+    # The app reads its configuration at import time, so point it at the stubs first
+    server, base_url = start_server(args.patients, seed=args.seed)
+    os.environ["FHIR_BASE_URL"] = base_url
+    install_stubs(embedding=args.embedding, llm_latency=args.llm_latency)
+
+    try:
+        from scripts.setup_database import setup_tables
+        from app.functions.fhir import process_patients
+        from app.functions.embedding import generate_embedding, get_embedding_model
+        from app.functions.iris import store_embedded_notes, store_patient_facts, fetch_notes
+        from app.functions.search import hybrid_search, rag_pipeline
+
+        setup_tables()
+
+        logger.info(f"Fetching and summarizing {args.patients} patients from {base_url}")
+        (summaries, failed), elapsed = timed(process_patients)
+        stages["process_patients"] = summarize_timings([elapsed], items=args.patients)
+        stages["process_patients"]["summaries"] = len(summaries)
+        stages["process_patients"]["failed"] = len(failed)
+
+        _, elapsed = timed(get_embedding_model)
+        stages["embedding_model_load"] = summarize_timings([elapsed])
+
+        logger.info(f"Generating {len(summaries)} embeddings")
+        durations = []
+        embeddings = []
+        for summary in summaries:
+            embedding, elapsed = timed(generate_embedding, summary["note_text"])
+            embeddings.append(embedding)
+            durations.append(elapsed)
+        stages["generate_embedding"] = summarize_timings(durations)
+
+        logger.info("Storing embedded notes")
+        _, elapsed = timed(store_embedded_notes, summaries, embeddings)
+        stages["store_embedded_notes"] = summarize_timings([elapsed], items=len(summaries))
+
+        _, elapsed = timed(store_patient_facts, summaries)
+        stages["store_patient_facts"] = summarize_timings([elapsed], items=len(summaries))
+
+        notes, elapsed = timed(fetch_notes)
+        stages["fetch_notes"] = summarize_timings([elapsed], items=len(notes))
+
+        queries = make_queries(args.patients, args.queries, seed=args.seed)
+
+        logger.info(f"Running {len(queries)} hybrid searches")
+        durations = [timed(hybrid_search, q, notes, k=args.k)[1] for q in queries]
+        stages["hybrid_search"] = summarize_timings(durations)
+
+        logger.info(f"Running {len(queries)} RAG pipeline queries")
+        durations = []
+        prompt_tokens = []
+        for q in queries:
+            usage = {}
+            durations.append(timed(rag_pipeline, q, k=args.k, stats=usage)[1])
+            if "prompt_tokens" in usage:
+                prompt_tokens.append(usage["prompt_tokens"])
+        stages["rag_pipeline"] = summarize_timings(durations)
+        if prompt_tokens:
+            stages["rag_pipeline"]["prompt_tokens_mean"] = round(sum(prompt_tokens) / len(prompt_tokens), 1)
+            stages["rag_pipeline"]["prompt_tokens_max"] = max(prompt_tokens)
+
+        logger.info(f"Running {len(queries)} patient-scoped RAG pipeline queries")
+        scoped = [(q, {"patient_id": patient_id(i % args.patients)}) for i, q in enumerate(queries)]
+        durations = [timed(rag_pipeline, q, k=args.k, filters=f)[1] for q, f in scoped]
+        stages["rag_pipeline_patient_scoped"] = summarize_timings(durations)
+    finally:
+        server.terminate()
+        server.join(timeout=5)
+
+    results["meta"]["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark with synthetic FHIR data")
+    parser.add_argument("--patients", type=parse_scale, default=1_000,
+                        help="Number of synthetic patients, or one of: 1k, 10k, 100k, 1m")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for data and queries")
+    parser.add_argument("--queries", type=int, default=20, help="Number of search/RAG queries to time")
+    parser.add_argument("-k", type=int, default=3, help="Number of notes retrieved per query")
+    parser.add_argument("--embedding", choices=["stub", "model"], default="stub",
+                        help="Use the deterministic stub encoder or the configured sentence-transformers model")
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="Simulated latency of the stub LLM, in seconds")
+    parser.add_argument("--label", default=None, help="Free-form label stored with the results")
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    logger.setLevel(logging.INFO)
+
+    results = run_benchmark(args)
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import tempfile
+
+# Add parent directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import install_stubs
+from benchmarks.synthetic import make_queries
+
+logger = logging.getLogger("clinical_assistant.bench.schema_upgrade")
+
+# NoteEmbeddings as created by the first release, before RowVersion was added
+BASELINE_DDL = """
+        CREATE TABLE IF NOT EXISTS NoteEmbeddings (
+            ID SERIAL,
+            PatientID VARCHAR(64),
+            NoteID VARCHAR(64),
+            NoteText TEXT,
+            Embedding TEXT
+        )
+        """
+
+
+def create_baseline_database(summaries):
+    """Store notes the way the first release did: baseline table, no registry, no fact tables"""
+    from app.functions.embedding import generate_embedding
+    from app.functions.iris import get_iris_connection
+
+    conn = get_iris_connection()
+    cursor = conn.cursor()
+    cursor.execute(BASELINE_DDL)
+    cursor.executemany(
+        "INSERT INTO NoteEmbeddings (PatientID, NoteID, NoteText, Embedding) VALUES (?, ?, ?, ?)",
+        [(s["patient_id"], s["note_id"], s["note_text"], json.dumps(generate_embedding(s["note_text"])))
+         for s in summaries]
+    )
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def has_row_version():
+    from app.functions.iris import get_iris_connection
+
+    conn = get_iris_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT RowVersion FROM NoteEmbeddings WHERE 1 = 0")
+        cursor.fetchall()
+        return True
+    except Exception:
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def queries_with_sources(queries):
+    """Number of queries answered with at least one source note"""
+    from app.functions.search import rag_pipeline
+
+    return sum(bool(rag_pipeline(q, k=3)[1]) for q in queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that a database from the first release keeps working")
+    parser.add_argument("--notes", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    # Semantic search only: the fact tables do not exist in a baseline database
+    os.environ["SEARCH_SQL_FAST_PATH"] = "false"
+    os.environ["SEARCH_INDEX_REFRESH_INTERVAL"] = "0"
+    database = os.path.join(tempfile.mkdtemp(prefix="schema-upgrade-"), "iris.db")
+    install_stubs(database=database)
+
+    from benchmarks.sharding import make_summaries
+    from app.functions.embedding import generate_embedding
+    from app.functions.index import get_note_index, refresh_note_index
+    from app.functions.iris import store_embedded_notes, get_patient_list
+    from scripts.setup_database import upgrade_tables
+
+    summaries = make_summaries(args.notes)
+    create_baseline_database(summaries)
+    queries = make_queries(args.notes, args.queries)
+    results = {"params": vars(args)}
+
+    # Before any upgrade: the index must still load from the baseline table
+    index = get_note_index()
+    results["before_upgrade"] = {
+        "row_version": has_row_version(),
+        "indexed_notes": len(index),
+        "queries_with_sources": queries_with_sources(queries)
+    }
+
+    # Startup on an initialized database upgrades the tables in place
+    upgrade_tables()
+    results["after_upgrade"] = {
+        "row_version": has_row_version(),
+        "patients": len(get_patient_list()),
+        "queries_with_sources": queries_with_sources(queries)
+    }
+
+    # In-place updates are now detected by the fingerprint
+    changed = dict(summaries[0], note_text=summaries[0]["note_text"] + "\n\nFollow-up visit recorded.")
+    store_embedded_notes([changed], [generate_embedding(changed["note_text"])])
+    index = refresh_note_index()
+    results["after_update"] = {
+        "index_version": index.version,
+        "update_visible": any(n["text"] == changed["note_text"] for n in index.notes)
+    }
+
+    results["passed"] = (
+        results["before_upgrade"]["indexed_notes"] == len(summaries)
+        and results["before_upgrade"]["queries_with_sources"] == len(queries)
+        and results["after_upgrade"]["row_version"]
+        and results["after_upgrade"]["patients"] == len(summaries)
+        and results["after_upgrade"]["queries_with_sources"] == len(queries)
+        and results["after_update"]["update_visible"]
+    )
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 0 if results["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import multiprocessing
+
+# Add parent directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import parse_scale, summarize_timings
+from benchmarks.stubs import install_stubs
+from benchmarks.synthetic import (
+    make_conditions, make_medication_statements, make_procedures, make_queries, patient_id
+)
+
+logger = logging.getLogger("clinical_assistant.bench.sharding")
+
+
+def make_summaries(count, seed=0):
+    """Patient summaries built straight from the synthetic resources, without the FHIR server"""
+    from app.functions.fhir import (
+        extract_condition, extract_medication, extract_procedure,
+        summarize_conditions, summarize_medications, summarize_procedures
+    )
+
+    summaries = []
+    for i in range(count):
+        pid = patient_id(i)
+        text = "\n\n".join(filter(None, [
+            summarize_conditions(pid, [extract_condition(c) for c in make_conditions(i, seed=seed)]),
+            summarize_medications(pid, [extract_medication(m) for m in make_medication_statements(i, seed=seed)]),
+            summarize_procedures(pid, [extract_procedure(p) for p in make_procedures(i, seed=seed)])
+        ]))
+        if text:
+            summaries.append({"patient_id": pid, "note_id": f"patient-summary-{pid}", "note_text": text})
+    return summaries
+
+
+def shard_process(shard, shards, database, delay, ready, cache_index=True):
+    """Child process: serve one shard from the shared stand-in database, optionally slowed down"""
+    logging.basicConfig(level=logging.WARNING)
+    os.environ["SEARCH_CACHE_INDEX"] = "true" if cache_index else "false"
+    install_stubs(database=database)
+    from app.shard_server import serve, ShardRequestHandler
+
+    class SlowShardRequestHandler(ShardRequestHandler):
+        def search(self, body):
+            time.sleep(delay)
+            return super().search(body)
+
+    serve(shard, shards, ready=ready, handler=SlowShardRequestHandler if delay else ShardRequestHandler)
+
+
+def start_shards(shards, database, delays=None, cache_index=True):
+    """Start shard server processes and return (processes, urls in shard order)"""
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    queues = []
+    for shard in range(shards):
+        ready = context.Queue()
+        delay = (delays or {}).get(shard, 0.0)
+        process = context.Process(
+            target=shard_process, args=(shard, shards, database, delay, ready, cache_index), daemon=True
+        )
+        process.start()
+        processes.append(process)
+        queues.append(ready)
+    return processes, [q.get(timeout=300) for q in queues]
+
+
+def run_queries(search, queries):
+    durations = []
+    results = []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(search(q))
+        durations.append(time.perf_counter() - start)
+    return results, summarize_timings(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-process and scatter-gather sharded search")
+    parser.add_argument("--notes", type=parse_scale, default=10_000,
+                        help="Number of synthetic patients, or one of: 1k, 10k, 100k, 1m")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=1.0, help="Coordinator deadline per query (s)")
+    parser.add_argument("--slow-delay", type=float, default=3.0, help="Delay of the slow shard in the straggler run")
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    # Shard processes share the notes through a stand-in database file
+    os.environ["SEARCH_INDEX_REFRESH_INTERVAL"] = "0"
+    database = os.path.join(tempfile.mkdtemp(prefix="shard-bench-"), "iris.db")
+    install_stubs(database=database)
+
+    from scripts.setup_database import setup_tables
+    from app.functions.embedding import generate_embedding
+    from app.functions.iris import store_embedded_notes
+    from app.functions.search import hybrid_search, select_notes, normalize_filters
+    from app.functions.shards import sharded_search
+
+    setup_tables()
+    logger.info(f"Storing {args.notes} synthetic patient notes")
+    summaries = make_summaries(args.notes)
+    store_embedded_notes(summaries, [generate_embedding(s["note_text"]) for s in summaries])
+    queries = make_queries(args.notes, args.queries)
+
+    results = {"params": vars(args)}
+
+    notes = select_notes(None)
+    single, results["single_process"] = run_queries(lambda q: hybrid_search(q, notes, k=args.k), queries)
+
+    filters = normalize_filters(None)
+    logger.info(f"Starting {args.shards} shard servers")
+    processes, urls = start_shards(args.shards, database)
+    try:
+        def scatter(q, shard_urls, stats=None):
+            return sharded_search(q, filters, k=args.k, urls=shard_urls, timeout=args.timeout, stats=stats)
+
+        # First round trips open the keep-alive connections
+        scatter(queries[0], urls)
+        sharded, results["sharded"] = run_queries(lambda q: scatter(q, urls), queries)
+        results["sharded"]["matches_single_process"] = sum(
+            [n["note_id"] for n in a] == [n["note_id"] for n in b] for a, b in zip(single, sharded)
+        ) / len(queries)
+
+        # Without the cached index every shard reads from the database, and must still only return its own patients
+        logger.info(f"Starting {args.shards} shard servers without the cached index")
+        uncached_processes, uncached_urls = start_shards(args.shards, database, cache_index=False)
+        processes += uncached_processes
+        scatter(queries[0], uncached_urls)
+        uncached, results["sharded_uncached"] = run_queries(lambda q: scatter(q, uncached_urls), queries)
+        results["sharded_uncached"]["matches_single_process"] = sum(
+            [n["note_id"] for n in a] == [n["note_id"] for n in b] for a, b in zip(single, uncached)
+        ) / len(queries)
+        results["sharded_uncached"]["duplicate_results"] = sum(
+            len(r) - len({n["note_id"] for n in r}) for r in uncached
+        )
+
+        # Straggler: replace shard 0 with a replica that answers after the deadline
+        logger.info(f"Starting a slow replica of shard 0 ({args.slow_delay}s)")
+        slow_processes, slow_urls = start_shards(args.shards, database, delays={0: args.slow_delay})
+        processes += slow_processes
+        straggler_urls = [slow_urls[0]] + urls[1:]
+        stats = {}
+        _, results["slow_shard"] = run_queries(lambda q: scatter(q, straggler_urls, stats), queries)
+        results["slow_shard"]["last_shards"] = stats["shards"]
+    finally:
+        for p in processes:
+            p.terminate()
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
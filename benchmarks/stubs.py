@@ -0,0 +1,192 @@
+import re
+import sys
+import time
+import types
+import sqlite3
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger("clinical_assistant.bench.stubs")
+
+EMBEDDING_DIM = 384
+
+
+# --- IRIS stand-in -----------------------------------------------------------
+
+_TOP_RE = re.compile(r"^\s*SELECT\s+(DISTINCT\s+)?TOP\s+(\d+)\s+(.*)$", re.IGNORECASE | re.DOTALL)
+
+
+def translate_sql(sql):
+    """Rewrite the IRIS SQL dialect used by the app into SQLite"""
+    sql = re.sub(r"\bID\s+SERIAL\b", "ID INTEGER PRIMARY KEY AUTOINCREMENT", sql, flags=re.IGNORECASE)
+    match = _TOP_RE.match(sql)
+    if match:
+        sql = f"SELECT {match.group(1) or ''}{match.group(3).rstrip().rstrip(';')} LIMIT {match.group(2)}"
+    return sql
+
+
+class StandInCursor:
+    """DB-API cursor that translates IRIS SQL before running it on SQLite"""
+
+    def __init__(self, cursor, lock):
+        self._cursor = cursor
+        self._lock = lock
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=()):
+        with self._lock:
+            self._cursor.execute(translate_sql(sql), tuple(params))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        with self._lock:
+            self._cursor.executemany(translate_sql(sql), [tuple(p) for p in seq_of_params])
+        return self
+
+    def fetchone(self):
+        with self._lock:
+            return self._cursor.fetchone()
+
+    def fetchmany(self, size=1000):
+        with self._lock:
+            return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        with self._lock:
+            return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandInConnection:
+    """DB-API connection to the shared in-process database"""
+
+    def __init__(self, database):
+        self._database = database
+        self._conn = sqlite3.connect(database.uri, uri=True, check_same_thread=False)
+        self._conn.execute("PRAGMA read_uncommitted = true")
+
+    def cursor(self):
+        return StandInCursor(self._conn.cursor(), self._database.lock)
+
+    def commit(self):
+        with self._database.lock:
+            self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class IRISStandIn:
+    """
+    In-process stand-in for the IRIS DB-API, backed by a shared in-memory SQLite database,
+    or by a database file when several processes need to see the same data
+    """
+
+    def __init__(self, name="iris_standin", path=None):
+        self.uri = f"file:{path}" if path else f"file:{name}?mode=memory&cache=shared"
+        self.lock = threading.RLock()
+        # Keep one connection open for the lifetime of the stand-in so the database survives
+        self._keepalive = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        self.connections = 0
+
+    def connect(self, hostname=None, port=None, namespace=None, username=None, password=None, **kwargs):
+        self.connections += 1
+        return StandInConnection(self)
+
+
+# --- Embedding model stand-in -----------------------------------------------
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class StubSentenceTransformer:
+    """Deterministic hashed bag-of-words encoder with the shape of bge-small"""
+
+    def __init__(self, model_name_or_path=None, **kwargs):
+        self.model_name = model_name_or_path
+        self._token_cache = {}
+
+    def _token_vector(self, token):
+        vector = self._token_cache.get(token)
+        if vector is None:
+            seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+            self._token_cache[token] = vector
+        return vector
+
+    def _encode_one(self, text):
+        vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            vector += self._token_vector(token)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def encode(self, sentences, convert_to_tensor=False, **kwargs):
+        if isinstance(sentences, str):
+            return self._encode_one(sentences)
+        return np.stack([self._encode_one(s) for s in sentences])
+
+
+# --- LLM stand-in -------------------------------------------------------------
+
+class StubInferenceClient:
+    """Deterministic stand-in for huggingface_hub.InferenceClient"""
+
+    latency = 0.0
+
+    def __init__(self, model=None, token=None, **kwargs):
+        self.calls = 0
+
+    def text_generation(self, prompt, model=None, max_new_tokens=None, temperature=None, top_p=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        patients = re.findall(r"\[Patient ([^\]]+)\]", prompt)
+        if patients:
+            return f"The relevant records belong to patient {patients[0]} (ref {digest})."
+        return f"No matching patient records were found (ref {digest})."
+
+
+def _install_module(name, **attrs):
+    module = types.ModuleType(name)
+    for key, value in attrs.items():
+        setattr(module, key, value)
+    sys.modules[name] = module
+    return module
+
+
+def install_stubs(embedding="stub", llm_latency=0.0, database=None):
+    """Register the stand-ins in sys.modules; must run before the app modules are imported"""
+    stand_in = IRISStandIn(path=database)
+    package = _install_module("intersystems_iris")
+    dbapi = _install_module("intersystems_iris.dbapi")
+    package.dbapi = dbapi
+    dbapi._DBAPI = _install_module("intersystems_iris.dbapi._DBAPI", connect=stand_in.connect)
+
+    StubInferenceClient.latency = llm_latency
+    _install_module("huggingface_hub", InferenceClient=StubInferenceClient)
+
+    if embedding == "stub":
+        _install_module("sentence_transformers", SentenceTransformer=StubSentenceTransformer)
+
+    logger.info(f"Installed benchmark stand-ins (embedding={embedding}, llm_latency={llm_latency}s)")
+    return stand_in
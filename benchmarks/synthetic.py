@@ -0,0 +1,205 @@
+import random
+from datetime import date, timedelta
+
+# Vocabularies used for the synthetic clinical records
+CONDITIONS = [
+    "Diabetes mellitus type 2",
+    "Essential hypertension",
+    "Hyperlipidemia",
+    "Chronic obstructive pulmonary disease",
+    "Asthma",
+    "Coronary artery disease",
+    "Chronic kidney disease stage 3",
+    "Osteoarthritis of knee",
+    "Major depressive disorder",
+    "Hypothyroidism",
+    "Atrial fibrillation",
+    "Obesity",
+    "Anemia",
+    "Migraine",
+    "Gastroesophageal reflux disease",
+    "Acute bronchitis",
+    "Viral sinusitis",
+    "Prediabetes",
+]
+
+MEDICATIONS = [
+    ("Metformin 500 MG Oral Tablet", 500, "mg", "Oral"),
+    ("Lisinopril 10 MG Oral Tablet", 10, "mg", "Oral"),
+    ("Atorvastatin 20 MG Oral Tablet", 20, "mg", "Oral"),
+    ("Albuterol 90 MCG Inhaler", 90, "mcg", "Inhalation"),
+    ("Levothyroxine 50 MCG Oral Tablet", 50, "mcg", "Oral"),
+    ("Sertraline 50 MG Oral Tablet", 50, "mg", "Oral"),
+    ("Warfarin 5 MG Oral Tablet", 5, "mg", "Oral"),
+    ("Insulin glargine 100 UNT/ML Injection", 20, "U", "Subcutaneous"),
+    ("Omeprazole 20 MG Oral Capsule", 20, "mg", "Oral"),
+    ("Amoxicillin 500 MG Oral Capsule", 500, "mg", "Oral"),
+    ("Ibuprofen 400 MG Oral Tablet", 400, "mg", "Oral"),
+    ("Amlodipine 5 MG Oral Tablet", 5, "mg", "Oral"),
+]
+
+PROCEDURES = [
+    ("Colonoscopy", "Colon"),
+    ("Knee arthroscopy", "Left knee"),
+    ("Coronary angiography", "Heart"),
+    ("Appendectomy", "Abdomen"),
+    ("Spirometry", None),
+    ("Echocardiography", "Heart"),
+    ("Hemodialysis", None),
+    ("Cataract extraction", "Right eye"),
+    ("Skin biopsy", "Left forearm"),
+    ("Electrocardiogram", None),
+]
+
+FAMILY_NAMES = ["Smith", "Garcia", "Nguyen", "Müller", "Rossi", "Kowalski", "Okafor", "Tanaka", "Dubois", "Silva"]
+GIVEN_NAMES = ["Anna", "Ben", "Chloe", "David", "Elena", "Farid", "Grace", "Hugo", "Ines", "Jonas"]
+
+EPOCH = date(1990, 1, 1)
+
+
+def patient_id(index):
+    """Return the FHIR id of the synthetic patient at a 0-based index"""
+    return str(index + 1)
+
+
+def patient_index(pid):
+    """Return the 0-based index of a synthetic patient id, or None if unknown"""
+    try:
+        index = int(pid) - 1
+    except (TypeError, ValueError):
+        return None
+    return index if index >= 0 else None
+
+
+def _rng(seed, index):
+    # One independent stream per patient so any patient can be generated on demand
+    return random.Random(seed * 1_000_003 + index)
+
+
+def _day(rng, start=EPOCH, span_days=12000):
+    return start + timedelta(days=rng.randrange(span_days))
+
+
+def make_patient(index, seed=0):
+    """Generate a synthetic Patient resource"""
+    rng = _rng(seed, index)
+    return {
+        "resourceType": "Patient",
+        "id": patient_id(index),
+        "name": [{"family": rng.choice(FAMILY_NAMES), "given": [rng.choice(GIVEN_NAMES)]}],
+        "gender": rng.choice(["male", "female"]),
+        "birthDate": (date(1930, 1, 1) + timedelta(days=rng.randrange(30000))).isoformat(),
+    }
+
+
+def make_conditions(index, seed=0, mean_count=4):
+    """Generate synthetic Condition resources for a patient"""
+    rng = _rng(seed, index * 4 + 1)
+    pid = patient_id(index)
+    resources = []
+    for i, name in enumerate(rng.sample(CONDITIONS, min(len(CONDITIONS), rng.randint(0, mean_count * 2)))):
+        onset = _day(rng)
+        resource = {
+            "resourceType": "Condition",
+            "id": f"cond-{pid}-{i}",
+            "subject": {"reference": f"Patient/{pid}"},
+            "code": {"text": name},
+            "clinicalStatus": {"coding": [{"code": rng.choice(["active", "active", "resolved", "inactive"])}]},
+            "verificationStatus": {"coding": [{"code": rng.choice(["confirmed", "confirmed", "provisional"])}]},
+            "onsetDateTime": onset.isoformat(),
+        }
+        if resource["clinicalStatus"]["coding"][0]["code"] != "active":
+            resource["abatementDateTime"] = _day(rng, onset, 2000).isoformat()
+        resources.append(resource)
+    return resources
+
+
+def make_medication_statements(index, seed=0, mean_count=3):
+    """Generate synthetic MedicationStatement resources for a patient"""
+    rng = _rng(seed, index * 4 + 2)
+    pid = patient_id(index)
+    resources = []
+    for i, (name, dose, unit, route) in enumerate(
+            rng.sample(MEDICATIONS, min(len(MEDICATIONS), rng.randint(0, mean_count * 2)))):
+        start = _day(rng)
+        resource = {
+            "resourceType": "MedicationStatement",
+            "id": f"med-{pid}-{i}",
+            "subject": {"reference": f"Patient/{pid}"},
+            "status": rng.choice(["active", "active", "completed", "stopped"]),
+            "medicationCodeableConcept": {"text": name},
+            "effectivePeriod": {"start": start.isoformat()},
+            "dosage": [{
+                "route": {"text": route},
+                "doseAndRate": [{"doseQuantity": {"value": dose, "unit": unit}}],
+            }],
+        }
+        if resource["status"] != "active":
+            resource["effectivePeriod"]["end"] = _day(rng, start, 1000).isoformat()
+        resources.append(resource)
+    return resources
+
+
+def make_procedures(index, seed=0, mean_count=2):
+    """Generate synthetic Procedure resources for a patient"""
+    rng = _rng(seed, index * 4 + 3)
+    pid = patient_id(index)
+    resources = []
+    for i, (name, site) in enumerate(rng.sample(PROCEDURES, min(len(PROCEDURES), rng.randint(0, mean_count * 2)))):
+        performed = _day(rng)
+        resource = {
+            "resourceType": "Procedure",
+            "id": f"proc-{pid}-{i}",
+            "subject": {"reference": f"Patient/{pid}"},
+            "status": rng.choice(["completed", "completed", "in-progress"]),
+            "code": {"text": name},
+        }
+        if resource["status"] == "completed":
+            resource["performedDateTime"] = performed.isoformat()
+        else:
+            resource["performedPeriod"] = {"start": performed.isoformat()}
+        if site:
+            resource["bodySite"] = [{"text": site}]
+        resources.append(resource)
+    return resources
+
+
+# FHIR resource type -> generator. "Medication" is what process_patients
+# requests, so it is served with MedicationStatement resources as well.
+RESOURCE_GENERATORS = {
+    "Condition": make_conditions,
+    "MedicationStatement": make_medication_statements,
+    "Medication": make_medication_statements,
+    "Procedure": make_procedures,
+}
+
+
+def make_resources(resource_type, index, seed=0):
+    """Generate the resources of one type for the patient at index"""
+    generator = RESOURCE_GENERATORS.get(resource_type)
+    if generator is None:
+        return []
+    return generator(index, seed=seed)
+
+
+def make_bundle(resources):
+    """Wrap resources in a FHIR searchset Bundle"""
+    return {
+        "resourceType": "Bundle",
+        "type": "searchset",
+        "total": len(resources),
+        "entry": [{"resource": r} for r in resources],
+    }
+
+
+def make_queries(num_patients, count, seed=0):
+    """Generate a deterministic list of clinical questions over the synthetic cohort"""
+    rng = random.Random(seed)
+    templates = [
+        lambda: f"What conditions does patient {patient_id(rng.randrange(num_patients))} have?",
+        lambda: f"Which medications is patient {patient_id(rng.randrange(num_patients))} taking?",
+        lambda: f"Which patients have {rng.choice(CONDITIONS).lower()}?",
+        lambda: f"Which patients are on {rng.choice(MEDICATIONS)[0].split()[0].lower()}?",
+        lambda: f"Has patient {patient_id(rng.randrange(num_patients))} had a {rng.choice(PROCEDURES)[0].lower()}?",
+    ]
+    return [templates[i % len(templates)]() for i in range(count)]
@@ -0,0 +1,250 @@
+import os
+import re
+import sys
+import json
+import random
+import logging
+import argparse
+
+# Add parent directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import summarize_timings, timed
+from app.utils.text_processing import clean_llm_response, ResponseCleaner
+
+logger = logging.getLogger("clinical_assistant.bench.text_cleaning")
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "clean_llm_response.jsonl")
+
+
+def legacy_clean_llm_response(response):
+    """clean_llm_response before the single-scan rewrite, kept as the reference output"""
+    response = re.sub(r'<[^>]+>.*?</[^>]+>', '', response, flags=re.DOTALL)
+    response = re.sub(r'<[^>]+>', '', response)
+    response = re.sub(r'```[^`]*```', '', response)
+    response = re.sub(r'```.*$', '', response, flags=re.DOTALL)
+    response = re.sub(r'Patient \d+ has (the following|undergone).+?(:|\n)', '', response)
+    response = re.sub(r'- [^\n]+\n', '', response)
+    response = re.sub(r'Please note that.*?question', '', response, flags=re.DOTALL | re.IGNORECASE)
+    response = re.sub(r'Let me know if this meets.*', '', response, flags=re.DOTALL | re.IGNORECASE)
+    response = re.sub(r'The answer should be.*', '', response, flags=re.DOTALL | re.IGNORECASE)
+    response = re.sub(r'I should.*', '', response, flags=re.DOTALL | re.IGNORECASE)
+    response = re.sub(r'Based on the information provided.*?,', '', response)
+    response = re.sub(r'According to the patient data.*?,', '', response)
+    response = re.sub(r'Best regards,.*', '', response, flags=re.DOTALL)
+    response = re.sub(r'Sincerely,.*', '', response, flags=re.DOTALL)
+    response = re.sub(r'Thanks,.*', '', response, flags=re.DOTALL)
+    response = re.sub(r'Note:.*', '', response)
+    response = re.sub(r'Disclaimer:.*', '', response)
+
+    sentences = [s.strip() for s in re.split(r'[.!?]', response) if s.strip()]
+    unique_sentences = []
+    for sentence in sentences:
+        if sentence and sentence not in unique_sentences and len(sentence) > 5:
+            unique_sentences.append(sentence)
+
+    clean_response = '. '.join(unique_sentences)
+    if clean_response and not clean_response.endswith('.'):
+        clean_response += '.'
+    clean_response = re.sub(r'\s{2,}', ' ', clean_response)
+    if not clean_response or clean_response.isspace():
+        return "I couldn't generate a clear answer. Please try rephrasing your question."
+    return clean_response
+
+
+# Pieces of model output, including every artifact clean_llm_response removes
+FRAGMENTS = [
+    "The patient has type 2 diabetes mellitus.",
+    "Metformin 500 mg is taken twice daily!",
+    "Was an appendectomy performed?",
+    "Hypertension is managed with lisinopril.",
+    "No known drug allergies are recorded.",
+    "Patient 1042 has the following conditions:\n",
+    "Patient 7 has undergone the following procedures: appendectomy\n",
+    "Patient 12 has the following medications",
+    "- Essential hypertension\n",
+    "- Asthma",
+    "<think>The question asks about diabetes.</think>",
+    "<s>",
+    "</s>",
+    "<|assistant|>",
+    "<unclosed tag",
+    "a < b and c > d",
+    "```\ncode block\n```",
+    "```python\nprint('x')",
+    "`inline`",
+    "Please note that I only used the data to answer the question.",
+    "please NOTE THAT this is incomplete",
+    "Let me know if this meets your needs.",
+    "The answer should be concise.",
+    "I should mention that",
+    "Based on the information provided, the patient is stable.",
+    "Based on the information provided the patient is stable",
+    "According to the patient data, no surgery was recorded.",
+    "Best regards, Assistant",
+    "Sincerely, the team",
+    "Thanks, bye",
+    "Note: values may be outdated.",
+    "Disclaimer: not medical advice.",
+    "Note that",
+    "question",
+    "Yes.",
+    "...",
+    "\n",
+    "\n\n",
+    "\r\n",
+    " ",
+    "  ",
+    "\t",
+    ",",
+    ":",
+]
+
+
+def make_response(rng, pieces=20):
+    """One synthetic response assembled from random fragments, with some repeated"""
+    chosen = [rng.choice(FRAGMENTS) for _ in range(pieces)]
+    chosen += rng.sample(chosen, k=pieces // 4)
+    rng.shuffle(chosen)
+    return "".join(f + rng.choice(["", " ", "\n"]) for f in chosen)
+
+
+# Artifacts that do not cut off the rest of the response
+INLINE_ARTIFACTS = [f for f in FRAGMENTS[5:17] + FRAGMENTS[25:27] + FRAGMENTS[30:32] if "```" not in f]
+
+
+def make_long_response(rng, size):
+    """A long, mostly clean answer with some artifacts, as a verbose model produces"""
+    clean = FRAGMENTS[:5]
+    parts = []
+    length = 0
+    while length < size:
+        part = rng.choice(INLINE_ARTIFACTS) if rng.random() < 0.1 else f"{rng.choice(clean)[:-1]} ({len(parts)})."
+        parts.append(part + rng.choice([" ", "\n"]))
+        length += len(parts[-1])
+    return "".join(parts)
+
+
+def make_adversarial(size):
+    """Inputs on which the old substitutions rescan the rest of the text from every start"""
+    return {
+        "unclosed_tags": "<a> x " * (size // 6),
+        "open_brackets": "<" * size,
+        "please_note": "Please note that " * (size // 17),
+        "based_on": "Based on the information provided " * (size // 34),
+        "list_markers": "- " * (size // 2),
+        "patient_data": "Patient 1 has the following " * (size // 28),
+        "sentences": "".join(f"Sentence number {i}. " for i in range(size // 20)),
+    }
+
+
+def split_tokens(rng, text):
+    """Cut text into pieces of 1-8 characters, like a token stream"""
+    tokens = []
+    i = 0
+    while i < len(text):
+        step = rng.randint(1, 8)
+        tokens.append(text[i:i + step])
+        i += step
+    return tokens
+
+
+def stream_clean(tokens):
+    cleaner = ResponseCleaner()
+    return "".join(cleaner.feed(t) for t in tokens) + cleaner.close()
+
+
+def load_golden(path=GOLDEN_PATH):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check(responses, rng):
+    """Compare the new cleaner, batch and streamed, with the expected output; return the mismatches"""
+    mismatches = []
+    for response, expected in responses:
+        if clean_llm_response(response) != expected:
+            mismatches.append({"response": response, "expected": expected, "mode": "batch"})
+        elif stream_clean(split_tokens(rng, response)) != expected:
+            mismatches.append({"response": response, "expected": expected, "mode": "stream"})
+    return mismatches
+
+
+def time_cleaner(clean, response, repeat):
+    durations = []
+    for _ in range(repeat):
+        _, seconds = timed(clean, response)
+        durations.append(seconds)
+    return summarize_timings(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time clean_llm_response against the old implementation")
+    parser.add_argument("--responses", type=int, default=2000, help="Random responses compared with the old output")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated lengths of long responses")
+    parser.add_argument("--adversarial-size", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--update-golden", action="store_true",
+                        help="Rewrite the golden corpus from the old implementation")
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    rng = random.Random(args.seed)
+
+    if args.update_golden:
+        golden = list(FRAGMENTS) + [make_response(random.Random(i), pieces=12) for i in range(200)]
+        os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+        with open(GOLDEN_PATH, "w") as f:
+            for response in golden:
+                f.write(json.dumps({"response": response, "expected": legacy_clean_llm_response(response)}) + "\n")
+        logger.info(f"Wrote {len(golden)} cases to {GOLDEN_PATH}")
+
+    golden = [(case["response"], case["expected"]) for case in load_golden()]
+    generated = [make_response(rng) for _ in range(args.responses)]
+    generated += [make_long_response(rng, 5000) for _ in range(20)]
+    logger.info(f"Checking {len(golden)} golden and {len(generated)} generated responses")
+    mismatches = check(golden, rng)
+    mismatches += check([(r, legacy_clean_llm_response(r)) for r in generated], rng)
+
+    results = {
+        "params": vars(args),
+        "checked": len(golden) + len(generated),
+        "mismatches": len(mismatches),
+        "first_mismatch": mismatches[0] if mismatches else None,
+        "long": {},
+        "adversarial": {}
+    }
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        response = make_long_response(rng, size)
+        results["long"][size] = {
+            "legacy": time_cleaner(legacy_clean_llm_response, response, args.repeat),
+            "current": time_cleaner(clean_llm_response, response, args.repeat),
+            "stream": time_cleaner(stream_clean, split_tokens(rng, response), args.repeat)
+        }
+
+    for name, response in make_adversarial(args.adversarial_size).items():
+        logger.info(f"Timing adversarial input: {name}")
+        results["adversarial"][name] = {
+            "legacy": time_cleaner(legacy_clean_llm_response, response, 1),
+            "current": time_cleaner(clean_llm_response, response, args.repeat),
+            "matches_legacy": clean_llm_response(response) == legacy_clean_llm_response(response)
+        }
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -26,7 +26,7 @@ def main():
 
     # Save summaries to file for later use
     with open("patient_summaries.json", "w") as f:
-        json.dump(summaries, f, indent=2)
+        json.dump(summaries, f, indent=2, default=lambda record: record.to_dict())
 
     logger.info(f"Saved {len(summaries)} patient summaries to patient_summaries.json")
 
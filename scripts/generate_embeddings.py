@@ -7,7 +7,7 @@ import json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.functions.embedding import generate_embedding
-from app.functions.iris import store_embedded_notes
+from app.functions.iris import store_embedded_notes, store_patient_facts
 
 logging.basicConfig(
     level=logging.INFO,
@@ -44,6 +44,10 @@ def main():
     logger.info("Storing embeddings in IRIS...")
     inserted, updated = store_embedded_notes(summaries, embeddings)
 
+    # Store structured facts for the SQL fast path
+    logger.info("Storing structured facts in IRIS...")
+    store_patient_facts(summaries)
+
     logger.info(f"Completed: {inserted} notes inserted, {updated} notes updated")
 
 
@@ -5,7 +5,10 @@ import logging
 # Add parent directory to path so we can import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.functions.iris import get_iris_connection
+from app.functions.iris import (
+    get_iris_connection, ensure_note_table, rebuild_patient_registry, rebuild_fact_terms,
+    EMBEDDING_CODEBOOKS_DDL, FACT_TABLES, FACT_TERMS_DDL
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,6 +17,17 @@ logging.basicConfig(
 logger = logging.getLogger("clinical_assistant.setup_database")
 
 
+def create_fact_terms_table(cursor):
+    """Create the word index of fact names used by the SQL fast path"""
+    cursor.execute(FACT_TERMS_DDL)
+    for name, columns in (("term", "ResourceType, Term"), ("patientid", "PatientID")):
+        try:
+            cursor.execute(f"CREATE INDEX idx_patientfactterms_{name} ON PatientFactTerms ({columns})")
+            logger.info(f"Created index on PatientFactTerms ({columns})")
+        except Exception as e:
+            logger.warning(f"Index creation failed (may already exist): {str(e)}")
+
+
 def setup_tables():
     """Set up necessary database tables in IRIS"""
     logger.info("Setting up database tables in IRIS")
@@ -23,15 +37,7 @@ def setup_tables():
         cursor = conn.cursor()
 
         # Create NoteEmbeddings table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS NoteEmbeddings (
-            ID SERIAL,
-            PatientID VARCHAR(64),
-            NoteID VARCHAR(64),
-            NoteText TEXT,
-            Embedding TEXT
-        )
-        """)
+        ensure_note_table(cursor)
 
         # Create index on NoteID for faster lookups
         try:
@@ -47,10 +53,28 @@ def setup_tables():
         except Exception as e:
             logger.warning(f"Index creation failed (may already exist): {str(e)}")
 
+        # Create table for trained embedding codebooks
+        cursor.execute(EMBEDDING_CODEBOOKS_DDL)
+
+        # Create structured fact tables used by the SQL fast path
+        for table, ddl, _ in FACT_TABLES.values():
+            cursor.execute(ddl)
+            for column in ("PatientID", "Status"):
+                try:
+                    cursor.execute(f"CREATE INDEX idx_{table.lower()}_{column.lower()} ON {table} ({column})")
+                    logger.info(f"Created index on {table}.{column}")
+                except Exception as e:
+                    logger.warning(f"Index creation failed (may already exist): {str(e)}")
+        create_fact_terms_table(cursor)
+
         conn.commit()
         cursor.close()
         conn.close()
 
+        # Create the patient registry, backfilled from notes stored before it existed
+        rebuild_patient_registry()
+        rebuild_fact_terms()
+
         logger.info("Database setup completed successfully")
         return True
     except Exception as e:
@@ -58,5 +82,35 @@ def setup_tables():
         return False
 
 
+def upgrade_tables():
+    """Bring tables created by an earlier version up to date; cheap enough to run on every startup"""
+    try:
+        conn = get_iris_connection()
+        cursor = conn.cursor()
+
+        ensure_note_table(cursor)
+        cursor.execute(EMBEDDING_CODEBOOKS_DDL)
+        for table, ddl, _ in FACT_TABLES.values():
+            cursor.execute(ddl)
+
+        # Added after the first release; its indexes are created along with the table
+        try:
+            cursor.execute("SELECT TOP 1 ID FROM PatientFactTerms")
+            cursor.fetchall()
+        except Exception:
+            create_fact_terms_table(cursor)
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        rebuild_patient_registry()
+        rebuild_fact_terms()
+        return True
+    except Exception as e:
+        logger.error(f"Error upgrading database tables: {str(e)}")
+        return False
+
+
 if __name__ == "__main__":
     setup_tables()
\ No newline at end of file
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import subprocess
+
+# Add parent directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("clinical_assistant.start_shards")
+
+
+def start_shards(shards, host="127.0.0.1", base_port=8100):
+    """Launch one local shard server process per shard and return (processes, urls)"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    processes = []
+    urls = []
+    for shard in range(shards):
+        port = base_port + shard
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "app.shard_server", "--shard", str(shard), "--shards", str(shards),
+             "--host", host, "--port", str(port)],
+            cwd=root
+        ))
+        urls.append(f"http://{host}:{port}")
+    return processes, urls
+
+
+def main():
+    """Run local shard servers until interrupted"""
+    parser = argparse.ArgumentParser(description="Start local shard servers for scatter-gather search")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=8100)
+    args = parser.parse_args()
+
+    processes, urls = start_shards(args.shards, args.host, args.base_port)
+    logger.info(f"Started {args.shards} shard servers. Point the app at them with:")
+    logger.info(f"SEARCH_SHARD_URLS={','.join(urls)}")
+
+    try:
+        while all(p.poll() is None for p in processes):
+            time.sleep(1)
+        logger.error("A shard server exited, stopping the others")
+    except KeyboardInterrupt:
+        logger.info("Stopping shard servers")
+    finally:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import os
+import sys
+import logging
+
+# Add parent directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.functions.index import train_codebook
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("clinical_assistant.train_codebook")
+
+
+def main():
+    """Retrain the SEARCH_CODEC codebook on the current notes; running indexes switch at their next refresh"""
+    logger.info("Training embedding codebook")
+    return 0 if train_codebook() is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())